@@ -0,0 +1,79 @@
+"""
+Benchmark :py:func:`birdfeeder.async_utils.async_ttl_cache` under a burst of concurrent cache misses.
+
+Compares upstream call count and caller latency of the coalescing cache against the previous implementation, which
+stored a result only after the coroutine finished.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_async_ttl_cache
+"""
+
+import asyncio
+import functools
+import statistics
+import time
+from typing import Any, Callable, List
+
+import cachetools
+
+from birdfeeder.async_utils import async_ttl_cache
+
+BURST_SIZE = 500
+UPSTREAM_LATENCY = 0.05
+
+
+def legacy_async_ttl_cache(ttl: int = 3600, maxsize: int = 1) -> Any:
+    """The previous implementation, without coalescing of concurrent misses."""
+    cache: cachetools.TTLCache = cachetools.TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def memoize(*args, **kwargs):
+            key = str((args, kwargs))
+            try:
+                return cache[key]
+            except KeyError:
+                result = await fn(*args, **kwargs)
+                cache[key] = result
+                return result
+
+        return memoize
+
+    return decorator
+
+
+async def run_burst(cache_decorator: Callable) -> None:
+    upstream_calls = 0
+
+    @cache_decorator(ttl=60, maxsize=10)
+    async def fetch_price(symbol: str) -> float:
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(UPSTREAM_LATENCY)
+        return 42.0
+
+    latencies: List[float] = []
+
+    async def caller() -> None:
+        start = time.perf_counter()
+        await fetch_price("BTC-USDT")
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[caller() for _ in range(BURST_SIZE)])
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    print(
+        f"{cache_decorator.__name__:>24}: burst={BURST_SIZE} upstream_calls={upstream_calls} "
+        f"p50={statistics.median(latencies) * 1000:.2f}ms p99={p99 * 1000:.2f}ms"
+    )
+
+
+async def main() -> None:
+    await run_burst(legacy_async_ttl_cache)
+    await run_burst(async_ttl_cache)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Microbenchmark of cache key construction for :py:func:`birdfeeder.async_utils.async_ttl_cache`.
+
+Compares the legacy ``str((args, kwargs))`` key with the tuple-based keys, for small scalar arguments, dataclass
+arguments and a large DataFrame argument. Each key is built and looked up in a dict, as the cache does.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_cache_keys
+"""
+
+import timeit
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Tuple
+
+import cachetools.keys
+import numpy as np
+import pandas as pd
+
+from birdfeeder.async_utils import repr_key
+
+
+@dataclass(frozen=True)
+class OrderRequest:
+    exchange: str
+    symbol: str
+    price: Decimal
+    amount: Decimal
+
+
+def lookup_cost(key_func: Callable, args: Tuple, kwargs: Dict[str, Any], number: int) -> float:
+    """Return the cost of building a key and looking it up, in microseconds per call."""
+    cache: Dict[Any, Any] = {}
+
+    def lookup():
+        cache.get(key_func(*args, **kwargs))
+
+    return timeit.timeit(lookup, number=number) / number * 1e6
+
+
+def main() -> None:
+    hashable_key_funcs: Dict[str, Callable] = {
+        "repr_key": repr_key,
+        "hashkey": cachetools.keys.hashkey,
+        "typedkey": cachetools.keys.typedkey,
+    }
+    # DataFrame is not hashable, so it needs an explicit ``key=``, e.g. the object identity
+    dataframe_key_funcs: Dict[str, Callable] = {"repr_key": repr_key, "key=id": lambda df: id(df)}
+    cases: List[Tuple[str, Tuple, Dict[str, Any], Dict[str, Callable], int]] = [
+        ("scalars", ("binance", "BTC-USDT", 60), {"limit": 100}, hashable_key_funcs, 100_000),
+        (
+            "dataclass",
+            (OrderRequest("binance", "BTC-USDT", Decimal("42000.1"), Decimal("0.5")),),
+            {},
+            hashable_key_funcs,
+            100_000,
+        ),
+        ("dataframe", (pd.DataFrame(np.random.rand(10_000, 8)),), {}, dataframe_key_funcs, 100),
+    ]
+    for case, args, kwargs, key_funcs, number in cases:
+        for name, key_func in key_funcs.items():
+            print(f"{case:>10} {name:>10}: {lookup_cost(key_func, args, kwargs, number):10.3f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark memory and read cost of :py:class:`birdfeeder.timed_aggregator.ColumnarTimedAggregator`.
+
+Compares it with :py:class:`birdfeeder.timed_aggregator.TimedAggregator` at 1M events per window, measuring the
+memory held by the window and the cost of a median read.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_columnar_timed_aggregator
+"""
+
+import timeit
+import tracemalloc
+
+from birdfeeder.timed_aggregator import ColumnarTimedAggregator, TimedAggregator
+
+EVENTS = 1_000_000
+READS = 10
+
+
+def measure(cls: type) -> None:
+    now = 0.0
+
+    def time_func() -> float:
+        return now
+
+    tracemalloc.start()
+    aggregator = cls(window_size_seconds=EVENTS, time_func=time_func)
+    for i in range(EVENTS):
+        aggregator.add(float(i % 1000))
+        now += 1
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    read_cost = timeit.timeit(lambda: aggregator.quantile(0.5), number=READS) / READS
+    print(
+        f"{cls.__name__:>24}: events={EVENTS} memory={memory / EVENTS:6.1f} B/event "
+        f"median={read_cost * 1e3:10.2f} ms"
+    )
+
+
+def main() -> None:
+    for cls in [TimedAggregator, ColumnarTimedAggregator]:
+        measure(cls)
+
+
+if __name__ == "__main__":
+    main()
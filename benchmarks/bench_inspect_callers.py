@@ -0,0 +1,50 @@
+"""
+Benchmark the cost of spawning a task with :py:func:`birdfeeder.async_utils.safe_ensure_future`.
+
+Compares caller inspection disabled, ``INSPECT_CALLERS_MODE=inspect`` and ``INSPECT_CALLERS_MODE=frame``.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_inspect_callers
+"""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+from birdfeeder import async_utils
+from birdfeeder.async_utils import InspectCallersMode
+
+NUMBER = 5_000
+
+
+async def noop() -> None:
+    pass
+
+
+async def spawn_cost() -> float:
+    """Return the cost of spawning a task, in microseconds."""
+    start = time.perf_counter()
+    tasks = [async_utils.safe_ensure_future(noop()) for _ in range(NUMBER)]
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*tasks)
+    return elapsed / NUMBER * 1e6
+
+
+async def main() -> None:
+    modes = [
+        ("off", False, InspectCallersMode.INSPECT),
+        ("inspect", True, InspectCallersMode.INSPECT),
+        ("frame", True, InspectCallersMode.FRAME),
+    ]
+    for name, should_inspect, mode in modes:
+        with patch.object(async_utils, "SHOULD_INSPECT", should_inspect), patch.object(
+            async_utils, "INSPECT_CALLERS_MODE", mode
+        ):
+            print(f"{name:>8}: {await spawn_cost():10.2f} us/spawn")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
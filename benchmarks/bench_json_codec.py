@@ -0,0 +1,66 @@
+"""
+Benchmark encoding and decoding with :py:data:`birdfeeder.json_helpers.default_codec`.
+
+Compares the registry-based codec with the previous isinstance chain and membership checks, on a payload of 100k
+records, most of which are plain dicts.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_json_codec
+"""
+
+import json
+import timeit
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict
+
+import pandas as pd
+
+from birdfeeder.json_helpers import json_decode_hook, json_encode_default
+
+RECORDS = 100_000
+REPEAT = 5
+
+
+def legacy_encode_default(obj: Any) -> Dict[str, Any]:
+    if isinstance(obj, Decimal):
+        return {'type(Decimal)': str(obj)}
+    elif isinstance(obj, pd.Timestamp):
+        return {'type(pd.Timestamp)': str(obj)}
+    elif isinstance(obj, datetime):
+        return {'type(datetime)': obj.isoformat()}
+    else:
+        raise TypeError(f"{repr(obj)} is not JSON serializable")
+
+
+def legacy_decode_hook(obj: Any) -> Any:
+    if 'type(Decimal)' in obj:
+        return Decimal(obj['type(Decimal)'])
+    elif 'type(pd.Timestamp)' in obj:
+        return pd.Timestamp(obj['type(pd.Timestamp)'])
+    elif 'type(datetime)' in obj:
+        return datetime.fromisoformat(obj['type(datetime)'])
+    return obj
+
+
+def measure(name: str, payload: Any, default: Callable[[Any], Any], hook: Callable[[Any], Any]) -> None:
+    encode_cost = min(timeit.repeat(lambda: json.dumps(payload, default=default), number=1, repeat=REPEAT))
+    encoded = json.dumps(payload, default=default)
+    decode_cost = min(timeit.repeat(lambda: json.loads(encoded, object_hook=hook), number=1, repeat=REPEAT))
+    print(f"{name:>8}: encode={encode_cost * 1e3:8.1f} ms decode={decode_cost * 1e3:8.1f} ms")
+
+
+def main() -> None:
+    payload = [
+        {"id": i, "meta": {"source": "binance", "flags": {"maker": True}}, "price": Decimal("42000.1")}
+        for i in range(RECORDS)
+    ]
+    measure("legacy", payload, legacy_encode_default, legacy_decode_hook)
+    measure("codec", payload, json_encode_default, json_decode_hook)
+
+
+if __name__ == "__main__":
+    main()
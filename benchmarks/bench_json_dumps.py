@@ -0,0 +1,64 @@
+"""
+Benchmark :py:func:`birdfeeder.json_helpers.dumps_fast` against ``json.dumps(to_valid_json_dict(...))``.
+
+Serializes an order book snapshot with 10k levels of Decimals per side, with the stdlib and orjson backends, converting
+Enums to values and to names.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_json_dumps
+"""
+
+import json
+import timeit
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, List
+from unittest.mock import patch
+
+from birdfeeder import json_helpers
+from birdfeeder.json_helpers import dumps_fast, to_valid_json_dict
+
+LEVELS = 10_000
+NUMBER = 10
+
+
+class Side(Enum):
+    BID = 1
+    ASK = 2
+
+
+def order_book() -> Dict[str, Any]:
+    def levels(side: Side) -> List[Dict[str, Any]]:
+        return [
+            {"side": side, "price": Decimal("42000.1") + i, "amount": Decimal("0.125") * (i % 7 + 1)}
+            for i in range(LEVELS)
+        ]
+
+    return {"symbol": "BTC-USDT", "bids": levels(Side.BID), "asks": levels(Side.ASK)}
+
+
+def run(book: Dict[str, Any], enum_to_name: bool) -> None:
+    print(f"enum_to_name={enum_to_name}")
+    cases: Dict[str, Callable[[], str]] = {
+        "two-step": lambda: json.dumps(to_valid_json_dict(book, decimal_to_str=True, enum_to_name=enum_to_name)),
+        "dumps_fast": lambda: dumps_fast(book, decimal_to_str=True, enum_to_name=enum_to_name),
+    }
+    for name, func in cases.items():
+        cost = timeit.timeit(func, number=NUMBER) / NUMBER
+        print(f"{name:>20}: {cost * 1e3:8.2f} ms")
+    with patch.object(json_helpers, "orjson", None):
+        cost = timeit.timeit(cases["dumps_fast"], number=NUMBER) / NUMBER
+        print(f"{'dumps_fast (stdlib)':>20}: {cost * 1e3:8.2f} ms")
+
+
+def main() -> None:
+    book = order_book()
+    run(book, enum_to_name=False)
+    run(book, enum_to_name=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark peak memory and time of JSON file I/O in :py:mod:`birdfeeder.json_helpers`.
+
+Compares :py:func:`birdfeeder.json_helpers.dump_to_file_as_json` and
+:py:func:`birdfeeder.json_helpers.load_json_from_file` with the streaming JSON Lines and array variants, on 100k
+records with Decimals, consumed one at a time.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_json_files
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator
+
+from birdfeeder.json_helpers import (
+    dump_to_file_as_json,
+    dump_to_file_as_jsonl,
+    iter_json_array_file,
+    iter_jsonl_file,
+    load_json_from_file,
+)
+
+RECORDS = 100_000
+
+
+def generate_records() -> Iterator[Dict[str, Any]]:
+    for i in range(RECORDS):
+        yield {"id": i, "symbol": "BTC-USDT", "price": Decimal("42000.1") + i, "amount": Decimal("0.125")}
+
+
+def measure(name: str, func: Callable[[], object]) -> None:
+    """Measure time and, in a separate run since tracing slows it down, peak memory."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>20}: {elapsed * 1e3:8.1f} ms peak={peak / 1e6:8.2f} MB")
+
+
+def consume(items: Iterator[Any]) -> None:
+    for _ in items:
+        pass
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "records.json")
+        jsonl_path = os.path.join(directory, "records.jsonl")
+        gzip_path = os.path.join(directory, "records.jsonl.gz")
+        measure("dump json", lambda: dump_to_file_as_json(list(generate_records()), json_path))
+        measure("dump jsonl", lambda: dump_to_file_as_jsonl(generate_records(), jsonl_path))
+        measure("dump jsonl.gz", lambda: dump_to_file_as_jsonl(generate_records(), gzip_path))
+        measure("load json", lambda: consume(iter(load_json_from_file(json_path))))
+        measure("iter json array", lambda: consume(iter_json_array_file(json_path)))
+        measure("iter jsonl", lambda: consume(iter_jsonl_file(jsonl_path)))
+        measure("iter jsonl.gz", lambda: consume(iter_jsonl_file(gzip_path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark normalization of exchange messages with :py:class:`birdfeeder.json_helpers.JSONTemplate`.
+
+Compares per-message key lookup and type conversion through ``name_key_map`` with the compiled
+:py:meth:`birdfeeder.json_helpers.JSONTemplate.decode`, and a DataFrame built from decoded records with
+:py:meth:`birdfeeder.json_helpers.JSONTemplate.decode_frame`.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_json_template
+"""
+
+import timeit
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from birdfeeder.json_helpers import JSONTemplate
+
+MESSAGES = 100_000
+REPEAT = 3
+
+TEMPLATE = JSONTemplate(
+    {
+        ("s", str, str, "symbol"),
+        ("p", str, Decimal, "price"),
+        ("q", str, float, "amount"),
+        ("T", int, int, "timestamp"),
+        ("m", bool, bool, "maker"),
+    }
+)
+VALUE_TYPES = {field.value_name: field.value_type for field in TEMPLATE._fields}
+
+
+def lookup_decode(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-message lookup and conversion, as done by consumers of name_key_map."""
+    return {name: VALUE_TYPES[name](message[key]) for name, key in TEMPLATE.name_key_map.items()}
+
+
+def best_of(func: Any) -> float:
+    return min(timeit.repeat(func, number=1, repeat=REPEAT)) * 1e3
+
+
+def main() -> None:
+    messages: List[Dict[str, Any]] = [
+        {"s": "BTCUSDT", "p": f"{42000 + i % 100}.1", "q": "0.125", "T": 1600000000000 + i, "m": i % 2 == 0}
+        for i in range(MESSAGES)
+    ]
+    print(f"{'lookup':>14}: {best_of(lambda: [lookup_decode(message) for message in messages]):8.1f} ms")
+    print(f"{'decode':>14}: {best_of(lambda: [TEMPLATE.decode(message) for message in messages]):8.1f} ms")
+    print(f"{'lookup frame':>14}: {best_of(lambda: pd.DataFrame(map(lookup_decode, messages))):8.1f} ms")
+    print(f"{'decode_frame':>14}: {best_of(lambda: TEMPLATE.decode_frame(messages)):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark allocations per message of :py:class:`birdfeeder.json_helpers.JSONTemplate` records.
+
+Compares seeding a record from defaults rebuilt on every access (the previous ``default_dict``), a copy of cached
+defaults and the read-only mapping of defaults. Also compares a decoded dict with a slotted record decoded by
+:py:meth:`birdfeeder.json_helpers.JSONTemplate.decode_record`. Reports time, and the number and size of memory blocks
+retained per message.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_json_template_defaults
+"""
+
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+from birdfeeder.json_helpers import JSONTemplate
+
+MESSAGES = 100_000
+
+TEMPLATE = JSONTemplate(
+    {
+        ("s", str, str, "symbol"),
+        ("p", str, Decimal, "price"),
+        ("q", str, float, "amount"),
+        ("T", int, int, "timestamp"),
+        ("m", bool, bool, "maker"),
+    }
+)
+MESSAGE = {"s": "BTCUSDT", "p": "42000.1", "q": "0.125", "T": 1600000000000, "m": True}
+
+
+def rebuilt_defaults() -> Dict[str, Any]:
+    record = JSONTemplate.get_default_template_dict(TEMPLATE._fields)
+    record.update(MESSAGE)
+    return record
+
+
+def copied_defaults() -> Dict[str, Any]:
+    record = TEMPLATE.default_dict
+    record.update(MESSAGE)
+    return record
+
+
+def mapping_defaults() -> Dict[str, Any]:
+    return {**TEMPLATE.default_mapping, **MESSAGE}
+
+
+def decoded_dict() -> Dict[str, Any]:
+    return TEMPLATE.decode(MESSAGE)
+
+
+def slotted_record() -> Any:
+    return TEMPLATE.decode_record(MESSAGE)
+
+
+def measure(name: str, func: Callable[[], Any]) -> None:
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        func()
+    elapsed = time.perf_counter() - start
+
+    records: List[Any] = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(MESSAGES):
+        records.append(func())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = [stat for stat in after.compare_to(before, "filename") if stat.size_diff > 0]
+    blocks = sum(stat.count_diff for stat in stats) / MESSAGES
+    size = sum(stat.size_diff for stat in stats) / MESSAGES
+    print(f"{name:>16}: {elapsed / MESSAGES * 1e9:8.1f} ns/message blocks={blocks:5.2f} retained={size:6.1f} B/message")
+
+
+def main() -> None:
+    measure("rebuilt defaults", rebuilt_defaults)
+    measure("copied defaults", copied_defaults)
+    measure("mapping defaults", mapping_defaults)
+    measure("decoded dict", decoded_dict)
+    measure("slotted record", slotted_record)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark :py:class:`birdfeeder.timed_aggregator.MultiWindowAggregator` against one
+:py:class:`birdfeeder.timed_aggregator.TimedAggregator` per window.
+
+Feeds 1s, 10s, 60s and 300s windows with 1000 events per second for 300 seconds, and reports the cost of an add and
+memory held by the aggregators.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_multi_window_aggregator
+"""
+
+import time
+import tracemalloc
+from typing import Callable
+
+from birdfeeder.timed_aggregator import MultiWindowAggregator, TimedAggregator
+
+WINDOWS = [1, 10, 60, 300]
+EVENTS_PER_SECOND = 1000
+SECONDS = 300
+
+
+def run(name: str, make_add: Callable[[Callable[[], float]], Callable[[], None]]) -> None:
+    now = 0.0
+
+    def time_func() -> float:
+        return now
+
+    tracemalloc.start()
+    add = make_add(time_func)
+    start = time.perf_counter()
+    for i in range(EVENTS_PER_SECOND * SECONDS):
+        now = i / EVENTS_PER_SECOND
+        add()
+    elapsed = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    events = EVENTS_PER_SECOND * SECONDS
+    print(f"{name:>14}: add={elapsed / events * 1e6:6.2f} us memory={memory / 1e6:8.2f} MB")
+
+
+def separate_aggregators(time_func: Callable[[], float]) -> Callable[[], None]:
+    aggregators = [TimedAggregator(window, time_func=time_func) for window in WINDOWS]
+
+    def add() -> None:
+        for aggregator in aggregators:
+            aggregator.add(1)
+
+    return add
+
+
+def multi_window_aggregator(time_func: Callable[[], float]) -> Callable[[], None]:
+    return MultiWindowAggregator(WINDOWS, time_func=time_func).add
+
+
+def main() -> None:
+    run("separate", separate_aggregators)
+    run("multi-window", multi_window_aggregator)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark :py:class:`birdfeeder.async_utils.TickDispatcher` against per-coroutine :py:func:`wait_til_next_tick`.
+
+Runs many subscribers, each waiting for a number of ticks, and reports the process CPU time and wakeup jitter (how
+late a subscriber is woken up after the tick boundary).
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_tick_dispatcher
+"""
+
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+from birdfeeder.async_utils import TickDispatcher, wait_til_next_tick
+
+SUBSCRIBERS = 10_000
+TICKS = 10
+PERIOD = 0.5
+
+
+async def run(name: str, wait: Callable[[float], Awaitable[None]]) -> None:
+    jitter: List[float] = []
+
+    async def subscriber() -> None:
+        for _ in range(TICKS):
+            await wait(PERIOD)
+            jitter.append(time.time() % PERIOD)
+
+    # Start on a tick boundary, so that all subscribers wait for the same ticks
+    await wait_til_next_tick(PERIOD)
+    cpu_start = time.process_time()
+    await asyncio.gather(*[subscriber() for _ in range(SUBSCRIBERS)])
+    cpu = time.process_time() - cpu_start
+
+    p99 = statistics.quantiles(jitter, n=100)[98]
+    print(
+        f"{name:>20}: subscribers={SUBSCRIBERS} ticks={TICKS} cpu={cpu:.2f}s "
+        f"jitter p50={statistics.median(jitter) * 1000:.2f}ms p99={p99 * 1000:.2f}ms max={max(jitter) * 1000:.2f}ms"
+    )
+
+
+async def main() -> None:
+    await run("wait_til_next_tick", wait_til_next_tick)
+    await run("TickDispatcher", TickDispatcher().wait_til_next_tick)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""
+Benchmark reads of :py:class:`birdfeeder.timed_aggregator.TimedAggregator` with a large window.
+
+Compares incrementally maintained aggregates with a full window scan, at 1M events per window.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_timed_aggregator
+"""
+
+import timeit
+from typing import Callable, Iterable, Union
+
+from birdfeeder.timed_aggregator import TimedAggregator, TimedMetricItem, summation
+
+EVENTS = 1_000_000
+READS = 10
+
+
+def scan_summation(items: Iterable[TimedMetricItem]) -> float:
+    """Same as summation, but isn't recognized by TimedAggregator, so it scans the window."""
+    return summation(items)
+
+
+def measure(name: str, func: Callable[[Iterable[TimedMetricItem]], Union[int, float]]) -> None:
+    now = 0.0
+
+    def time_func() -> float:
+        return now
+
+    aggregator = TimedAggregator(window_size_seconds=EVENTS, aggregation_func=func, time_func=time_func)
+    for _ in range(EVENTS):
+        aggregator.add(1)
+        now += 1
+    read_cost = timeit.timeit(lambda: aggregator.aggregated_value, number=READS) / READS
+    print(f"{name:>12}: events={EVENTS} read={read_cost * 1e6:12.2f} us")
+
+
+def main() -> None:
+    for name, func in [("full scan", scan_summation), ("running sum", summation)]:
+        measure(name, func)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Benchmark adding values to :py:class:`birdfeeder.timed_aggregator.TimedAggregator` on a write-heavy metric.
+
+Compares eviction on every add with lazy eviction (``eviction_threshold``), with the wall clock and the monotonic
+clock, for a 1s window fed with a steady stream of values and read rarely.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_timed_aggregator_add
+"""
+
+import timeit
+
+from birdfeeder.timed_aggregator import TimedAggregator
+
+NUMBER = 500_000
+
+
+def main() -> None:
+    aggregators = {
+        "time.time": TimedAggregator(1),
+        "time.time lazy": TimedAggregator(1, eviction_threshold=100_000),
+        "monotonic_ns": TimedAggregator.monotonic(1),
+        "monotonic_ns lazy": TimedAggregator.monotonic(1, eviction_threshold=100_000),
+    }
+    for name, aggregator in aggregators.items():
+        cost = timeit.timeit(aggregator.add, number=NUMBER) / NUMBER
+        print(f"{name:>18}: add={cost * 1e9:8.1f} ns")
+
+
+if __name__ == "__main__":
+    main()
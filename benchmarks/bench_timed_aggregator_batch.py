@@ -0,0 +1,40 @@
+"""
+Benchmark batched ingestion of :py:class:`birdfeeder.timed_aggregator.TimedAggregator`.
+
+Compares a loop of ``add()`` calls with one ``add_many()`` call, for a websocket frame of 2,000 trades.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_timed_aggregator_batch
+"""
+
+import functools
+import timeit
+
+import numpy as np
+
+from birdfeeder.timed_aggregator import BucketedTimedAggregator, TimedAggregator
+
+FRAME_SIZE = 2_000
+FRAMES = 500
+
+
+def main() -> None:
+    amounts = np.random.rand(FRAME_SIZE)
+    amounts_list = amounts.tolist()
+    for aggregator_cls in [TimedAggregator, BucketedTimedAggregator]:
+        cases = {
+            "add() loop": lambda aggregator: [aggregator.add(amount) for amount in amounts_list],
+            "add_many(list)": lambda aggregator: aggregator.add_many(amounts_list),
+            "add_many(ndarray)": lambda aggregator: aggregator.add_many(amounts),
+        }
+        for name, ingest in cases.items():
+            aggregator = aggregator_cls(60)
+            cost = timeit.timeit(functools.partial(ingest, aggregator), number=FRAMES) / FRAMES
+            print(f"{aggregator_cls.__name__:>24} {name:>18}: {cost * 1e6:10.1f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark :py:class:`birdfeeder.timed_aggregator.TimedAggregatorRegistry` with many labelled series.
+
+Compares a registry with a dict of :py:class:`birdfeeder.timed_aggregator.TimedAggregator` instances, which evict
+values on every add and read the clock once per series on read, and reports memory taken by each series.
+
+Run with:
+
+.. code-block:: bash
+
+    python -m benchmarks.bench_timed_aggregator_registry
+"""
+
+import itertools
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from birdfeeder.timed_aggregator import TimedAggregator, TimedAggregatorRegistry
+
+SERIES = [(exchange, f"SYMBOL-{i}", event) for exchange, i, event in itertools.product(range(5), range(2000), range(3))]
+EVENTS_PER_SERIES = 10
+
+
+def best_of(func: Callable[[], object], repeat: int = 3) -> float:
+    """Return the best wall time of a function, in milliseconds."""
+    costs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        costs.append(time.perf_counter() - start)
+    return min(costs) * 1e3
+
+
+def main() -> None:
+    tracemalloc.start()
+    aggregators = {labels: TimedAggregator(60) for labels in SERIES}
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{'dict':>10}: series={len(SERIES)} memory={memory / len(SERIES):8.1f} B/series before adding values")
+
+    def add_to_dict() -> None:
+        for _ in range(EVENTS_PER_SERIES):
+            for labels in SERIES:
+                aggregators[labels].add(1)
+
+    def snapshot_dict() -> None:
+        {labels: aggregator.aggregated_value for labels, aggregator in aggregators.items()}
+
+    registry = TimedAggregatorRegistry(60)
+
+    def add_to_registry() -> None:
+        for _ in range(EVENTS_PER_SERIES):
+            for labels in SERIES:
+                registry.add(labels, 1)
+
+    cases: List[Tuple[str, Callable[[], object], Callable[[], object]]] = [
+        ("dict", add_to_dict, snapshot_dict),
+        ("registry", add_to_registry, registry.snapshot),
+    ]
+    for name, add, snapshot in cases:
+        add_cost = best_of(add)
+        snapshot_cost = best_of(snapshot)
+        print(f"{name:>10}: series={len(SERIES)} add={add_cost:8.1f} ms snapshot={snapshot_cost:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
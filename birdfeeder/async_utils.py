@@ -2,35 +2,259 @@ import asyncio
 import functools
 import inspect
 import logging
+import math
+import random
 import sys
 import time
-from typing import Any, List, Tuple, Union
+import weakref
+from collections import deque
+from enum import auto
+from types import CodeType, FrameType
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import cachetools
-from async_timeout import timeout
+import cachetools.keys
 from environs import Env
 
+from .enum.str_enum import StrEnum
+
 log = logging.getLogger(__name__)
 env = Env()
 env.read_env()  # read .env file, if it exists
 SHOULD_INSPECT = env.bool("INSPECT_CALLERS", False)
 
 
-def async_ttl_cache(ttl: int = 3600, maxsize: int = 1) -> Any:
-    """Decorator to cache a coroutine result using :py:class:`cachetools.TTLCache`."""
-    cache: cachetools.TTLCache = cachetools.TTLCache(ttl=ttl, maxsize=maxsize)
+class InspectCallersMode(StrEnum):
+    INSPECT = auto()  # resolve callers with inspect.stack(), slow
+    FRAME = auto()  # capture code objects only, format them on failure
+
+
+def _parse_inspect_callers_mode(value: str) -> InspectCallersMode:
+    if value not in InspectCallersMode:
+        choices = ", ".join(mode.value for mode in InspectCallersMode)
+        raise ValueError(f"INSPECT_CALLERS_MODE should be one of {choices}, got {value!r}")
+    return InspectCallersMode(value)
+
+
+INSPECT_CALLERS_MODE = _parse_inspect_callers_mode(env.str("INSPECT_CALLERS_MODE", InspectCallersMode.INSPECT.value))
+
+T = TypeVar("T")
+RT = TypeVar("RT")
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of :py:func:`async_ttl_cache`, like :py:func:`functools.lru_cache` ``cache_info()``."""
+
+    hits: int
+    misses: int
+    evictions: int  # items dropped because cache is full or expired
+    currsize: int
+    maxsize: int
+
+
+class _StatsTTLCache(cachetools.TTLCache):
+    """:py:class:`cachetools.TTLCache` which counts evicted and expired items."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def expire(self, time=None):
+        size = cachetools.Cache.__len__(self)
+        expired = super().expire(time)
+        self.evictions += size - cachetools.Cache.__len__(self)
+        return expired
+
+
+class _CacheEntry(NamedTuple):
+    value: Any
+    created: float  # cache timer value when the entry was stored
+
+
+def repr_key(*args: Any, **kwargs: Any) -> str:
+    """Build a cache key from a string representation of arguments, for arguments which are not hashable."""
+    return str((args, kwargs))
+
+
+def async_ttl_cache(
+    ttl: float = 3600,
+    maxsize: int = 1,
+    typed: bool = False,
+    key: Optional[Callable[..., Hashable]] = None,
+    per_instance: bool = False,
+    stale_ttl: float = 0,
+    refresh_ahead: float = 0,
+) -> Any:
+    """
+    Decorator to cache a coroutine result using :py:class:`cachetools.TTLCache`.
+
+    Concurrent calls which miss the cache for the same key are coalesced: the coroutine is awaited only once, and
+    every caller waits for that single in-flight call. An exception is propagated to all waiting callers and is not
+    cached, so the next call retries.
+
+    By default, the cache key is a tuple of arguments (see :py:func:`cachetools.keys.hashkey`). If arguments are not
+    hashable, a call raises TypeError: pass ``key``, e.g. a function picking hashable parts of arguments, or
+    :py:func:`repr_key`.
+
+    The decorated function provides ``cache_info()``, ``cache_clear()`` and ``invalidate(*args, **kwargs)``. For a
+    method, pass the instance explicitly: ``Client.fetch.invalidate(client, symbol)``.
+
+    With ``stale_ttl`` or ``refresh_ahead``, a cached result which is expired (or about to expire) is returned
+    immediately, and a single background task refreshes it. If the refresh fails, the error is logged and the stale
+    result is kept until ``ttl + stale_ttl`` passes.
+
+    Example with a separate cache for each instance of a class:
+
+    .. code-block:: python
+
+        class ExchangeClient:
+            @async_ttl_cache(ttl=60, maxsize=100, per_instance=True)
+            async def get_trading_rules(self, symbol: str) -> TradingRules:
+                ...
+
+    :param ttl: time-to-live of a cached result, seconds
+    :param maxsize: maximum number of cached results (per instance, if ``per_instance`` is set)
+    :param typed: cache arguments of different types separately, e.g. ``f(1)`` and ``f(1.0)``
+    :param key: a function to build a cache key from call arguments, overrides ``typed``
+    :param per_instance: decorated function is a method, keep a separate cache for each instance. The cache is
+        dropped when the instance is garbage-collected, ``self`` is not a part of the cache key. Instances should
+        support weak references, i.e. a class with ``__slots__`` should have ``__weakref__`` slot
+    :param stale_ttl: how many seconds after ``ttl`` an expired result is still returned, while it's being refreshed
+    :param refresh_ahead: refresh a result in background when it's younger than ``ttl``, but will expire in less
+        than ``refresh_ahead`` seconds
+    """
+    if not 0 <= refresh_ahead <= ttl:
+        raise ValueError(f"refresh_ahead should be between 0 and ttl ({ttl}), got {refresh_ahead}")
+    cache_ttl = ttl + stale_ttl
+    refresh_age = ttl - refresh_ahead if stale_ttl or refresh_ahead else math.inf
+    shared_cache: _StatsTTLCache = _StatsTTLCache(ttl=cache_ttl, maxsize=maxsize)
+    instance_caches: Dict[int, _StatsTTLCache] = {}
+    in_flight: Dict[Tuple[Optional[int], Hashable], asyncio.Future] = {}
+    hits = misses = 0
+
+    if key is not None:
+        make_key = key
+    else:
+        make_key = cachetools.keys.typedkey if typed else cachetools.keys.hashkey
+
+    def get_cache(args: Tuple) -> Tuple[Optional[int], _StatsTTLCache, Tuple]:
+        """Return a cache scope, a cache and arguments to build a key from."""
+        if not per_instance:
+            return None, shared_cache, args
+        instance, *key_args = args
+        scope = id(instance)
+        try:
+            cache = instance_caches[scope]
+        except KeyError:
+            try:
+                weakref.finalize(instance, instance_caches.pop, scope, None)
+            except TypeError:
+                raise TypeError(
+                    f"per_instance cache requires weak references to {type(instance).__qualname__} instances, "
+                    "add '__weakref__' to its __slots__"
+                ) from None
+            cache = instance_caches[scope] = _StatsTTLCache(ttl=cache_ttl, maxsize=maxsize)
+        return scope, cache, tuple(key_args)
+
+    def all_caches() -> List[_StatsTTLCache]:
+        return list(instance_caches.values()) if per_instance else [shared_cache]
+
+    def cache_info() -> CacheInfo:
+        caches = all_caches()
+        return CacheInfo(
+            hits=hits,
+            misses=misses,
+            evictions=sum(c.evictions for c in caches),
+            currsize=sum(len(c) for c in caches),
+            maxsize=maxsize,
+        )
+
+    def cache_clear() -> None:
+        nonlocal hits, misses
+        # Instance caches are emptied, but kept: the finalizer registered for an instance drops its cache
+        for cache in [shared_cache, *instance_caches.values()]:
+            cache.clear()
+            cache.evictions = 0
+        hits = misses = 0
+
+    def invalidate(*args: Any, **kwargs: Any) -> None:
+        """Remove a cached result for given call arguments, if any."""
+        _, cache, key_args = get_cache(args)
+        cache.pop(make_key(*key_args, **kwargs), None)
 
     def decorator(fn):
-        @functools.wraps(fn)
-        async def memoize(*args, **kwargs):
-            key = str((args, kwargs))
+        async def fetch(cache, scope, cache_key, args, kwargs):
             try:
-                return cache[key]
-            except KeyError:
                 result = await fn(*args, **kwargs)
-                cache[key] = result
+                cache[cache_key] = _CacheEntry(result, cache.timer())
                 return result
+            finally:
+                del in_flight[scope, cache_key]
+
+        def start_fetch(
+            cache: _StatsTTLCache, scope: Optional[int], cache_key: Hashable, args: Tuple, kwargs: Dict[str, Any]
+        ) -> asyncio.Future:
+            try:
+                return in_flight[scope, cache_key]
+            except KeyError:
+                future = asyncio.ensure_future(fetch(cache, scope, cache_key, args, kwargs))
+                in_flight[scope, cache_key] = future
+                return future
 
+        async def refresh(future):
+            try:
+                await future
+            except Exception:
+                log.warning(f"Failed to refresh cached result of {fn.__qualname__}, keeping stale one.", exc_info=True)
+
+        @functools.wraps(fn)
+        async def memoize(*args, **kwargs):
+            nonlocal hits, misses
+            scope, cache, key_args = get_cache(args)
+            cache_key = make_key(*key_args, **kwargs)
+            try:
+                entry = cache[cache_key]
+            except KeyError:
+                misses += 1
+            except TypeError:
+                raise TypeError(
+                    f"Cache key of {fn.__qualname__} arguments is not hashable, pass key= to async_ttl_cache, "
+                    "e.g. key=repr_key"
+                ) from None
+            else:
+                hits += 1
+                if cache.timer() - entry.created >= refresh_age and (scope, cache_key) not in in_flight:
+                    safe_ensure_future(refresh(start_fetch(cache, scope, cache_key, args, kwargs)))
+                return entry.value
+            future = start_fetch(cache, scope, cache_key, args, kwargs)
+            # Shield the shared call, so cancellation of one caller doesn't cancel it for the others
+            return await asyncio.shield(future)
+
+        memoize.cache_info = cache_info  # type: ignore[attr-defined]
+        memoize.cache_clear = cache_clear  # type: ignore[attr-defined]
+        memoize.invalidate = invalidate  # type: ignore[attr-defined]
         return memoize
 
     return decorator
@@ -49,6 +273,44 @@ def get_callers(stack_size: int = 5) -> List[Tuple[int, str, Any]]:
     return sorted(callers)
 
 
+class LazyCallers:
+    """
+    Callers captured with :py:func:`sys._getframe`, which are formatted only when converted to string.
+
+    Capture is cheap: source lines and modules aren't resolved, and frames aren't kept alive. String form is the
+    same as of :py:func:`get_callers`.
+    """
+
+    __slots__ = ("_callers",)
+
+    def __init__(self, frame: Optional[FrameType], stack_size: int = 5):
+        """
+        :param frame: the innermost frame to capture, it gets index 1
+        :param stack_size: same as for :py:func:`get_callers`
+        """
+        self._callers: List[Tuple[str, CodeType]] = []
+        for _ in range(1, stack_size):
+            if frame is None:
+                break
+            self._callers.append((frame.f_globals.get("__name__", "unknown"), frame.f_code))
+            frame = frame.f_back
+
+    def __str__(self) -> str:
+        return "\n" + "\n".join(
+            str((index, module, code.co_name)) for index, (module, code) in enumerate(self._callers, start=1)
+        )
+
+
+def _get_caller_names() -> Union[str, LazyCallers]:
+    """Capture callers of a calling function for logging, according to INSPECT_CALLERS settings."""
+    if not SHOULD_INSPECT:
+        return ""
+    if INSPECT_CALLERS_MODE == InspectCallersMode.FRAME:
+        return LazyCallers(sys._getframe(1))
+    # Skip this helper, so that the calling function gets index 1
+    return "\n" + "\n".join(str((index - 1, module, name)) for index, module, name in get_callers(6)[1:])
+
+
 def safe_ensure_future(coro, old_naming_style=False, call_loop_exception_handler=False, *args, **kwargs):
     """
     Run a coroutine in a wrapper, catching and logging unexpected exception.
@@ -59,10 +321,9 @@ def safe_ensure_future(coro, old_naming_style=False, call_loop_exception_handler
         garbage-collected. But if there is a reference, it prevents such call. See https://bugs.python.org/issue28274
         for details
     :envvar: INSPECT_CALLERS: if true, show callers on failure
+    :envvar: INSPECT_CALLERS_MODE: "inspect" (default) or "frame", which is much cheaper
     """
-    caller_names = ""
-    if SHOULD_INSPECT:
-        caller_names = "\n" + "\n".join([str(t) for t in get_callers()])
+    caller_names = _get_caller_names()
 
     async def safe_wrapper(c):
         try:
@@ -89,7 +350,42 @@ def safe_ensure_future(coro, old_naming_style=False, call_loop_exception_handler
     return asyncio.ensure_future(wrapped_coro, *args, **kwargs)
 
 
-async def safe_gather(*args, **kwargs):
+async def _gather_bounded(aws: Iterable[Awaitable], limit: int, return_exceptions: bool = False) -> List[Any]:
+    """
+    Await awaitables using a pool of ``limit`` workers, keeping results order.
+
+    Awaitables are taken from the iterable lazily, so a generator of coroutines isn't consumed all at once.
+    """
+    if limit < 1:
+        raise ValueError(f"limit should be positive, got {limit}")
+    results: Dict[int, Any] = {}
+    pending = enumerate(aws)
+
+    async def worker() -> None:
+        # Workers share the same iterator, every awaitable is taken by exactly one worker
+        for index, aw in pending:
+            try:
+                results[index] = await aw
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[index] = e
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(limit)]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        for _, aw in pending:
+            # Don't leave coroutines which were never awaited
+            if inspect.iscoroutine(aw):
+                aw.close()
+        raise
+    return [results[index] for index in range(len(results))]
+
+
+async def safe_gather(*args: Awaitable, limit: Optional[int] = None, **kwargs: Any) -> List[Any]:
     """
     Gather an awaitables logging unexpected exceptions.
 
@@ -97,12 +393,15 @@ async def safe_gather(*args, **kwargs):
 
         Exception is logged and re-raised!
 
+    :param limit: if set, await at most ``limit`` awaitables concurrently. This only makes sense for coroutines:
+        tasks and futures are already running
     :envvar: INSPECT_CALLERS: if true, show callers on failure
+    :envvar: INSPECT_CALLERS_MODE: "inspect" (default) or "frame", which is much cheaper
     """
-    caller_names = ""
-    if SHOULD_INSPECT:
-        caller_names = "\n" + "\n".join([str(t) for t in get_callers()])
+    caller_names = _get_caller_names()
     try:
+        if limit is not None:
+            return await _gather_bounded(args, limit, **kwargs)
         return await asyncio.gather(*args, **kwargs)
     except Exception as e:
         logging.getLogger().debug(
@@ -112,6 +411,93 @@ async def safe_gather(*args, **kwargs):
         raise
 
 
+async def safe_map(
+    func: Callable[[T], Awaitable[RT]],
+    iterable: Iterable[T],
+    limit: int,
+    return_exceptions: bool = False,
+) -> List[RT]:
+    """
+    Apply a coroutine function to every item, running at most ``limit`` coroutines concurrently.
+
+    Coroutines are created lazily, when a worker is free, so it's suitable for large fan-outs:
+
+    .. code-block:: python
+
+        objects = await safe_map(s3_client.head_object, keys, limit=100)
+
+    .. note::
+
+        Exception is logged and re-raised, unless ``return_exceptions`` is set!
+
+    :return: results, in the order of items
+    :envvar: INSPECT_CALLERS: if true, show callers on failure
+    :envvar: INSPECT_CALLERS_MODE: "inspect" (default) or "frame", which is much cheaper
+    """
+    caller_names = _get_caller_names()
+    try:
+        return await _gather_bounded((func(item) for item in iterable), limit, return_exceptions)
+    except Exception as e:
+        logging.getLogger().debug(
+            f"Unhandled error in background task: {str(e)} {caller_names}",
+            exc_info=True,
+        )
+        raise
+
+
+async def safe_as_completed(aws: Iterable[Awaitable[RT]], limit: Optional[int] = None) -> AsyncIterator[RT]:
+    """
+    Iterate over results of awaitables as they complete, running at most ``limit`` of them concurrently.
+
+    Awaitables are taken from the iterable lazily, so results could be processed in a stream:
+
+    .. code-block:: python
+
+        async for obj in safe_as_completed((s3_client.get_object(key) for key in keys), limit=100):
+            process(obj)
+
+    .. note::
+
+        Exception is logged and re-raised, remaining awaitables are cancelled!
+
+    :envvar: INSPECT_CALLERS: if true, show callers on failure
+    :envvar: INSPECT_CALLERS_MODE: "inspect" (default) or "frame", which is much cheaper
+    """
+    if limit is not None and limit < 1:
+        raise ValueError(f"limit should be positive, got {limit}")
+    caller_names = _get_caller_names()
+    source = iter(aws)
+    running: Set[asyncio.Future] = set()
+    done: Set[asyncio.Future] = set()
+    try:
+        while True:
+            for aw in source:
+                running.add(asyncio.ensure_future(aw))
+                if limit is not None and len(running) >= limit:
+                    break
+            if not running:
+                return
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            while done:
+                yield done.pop().result()
+    except Exception as e:
+        logging.getLogger().debug(
+            f"Unhandled error in background task: {str(e)} {caller_names}",
+            exc_info=True,
+        )
+        raise
+    finally:
+        for future in running:
+            future.cancel()
+        for future in done:
+            # Mark exceptions of completed, but not yielded awaitables as retrieved
+            if not future.cancelled():
+                future.exception()
+        for aw in source:
+            if inspect.iscoroutine(aw):
+                aw.close()
+
+
 async def safe_cancel(task: asyncio.Task, info: str, cancel_wait_timeout: Union[int, float] = 10) -> int:
     """
     Cancel asyncio task and retry cancel if task didn't finished.
@@ -127,19 +513,196 @@ async def safe_cancel(task: asyncio.Task, info: str, cancel_wait_timeout: Union[
         task.cancel()
         log.debug(f"Task cancel request sent to task: {task}, additional info: {info}")
 
-        try:
-            async with timeout(cancel_wait_timeout):
-                while not task.done():
-                    await asyncio.sleep(cancel_wait_timeout / 10)
-        except asyncio.TimeoutError:
-            log.warning(f"Task failed to stop: {task}, additional task info: {info}, retries: {retries}")
-        else:
+        await asyncio.wait({task}, timeout=cancel_wait_timeout)
+        if task.done():
             log.info(f"Task cancelled: {task}, additional info: {info}")
             return retries
+        log.warning(f"Task failed to stop: {task}, additional task info: {info}, retries: {retries}")
 
         retries += 1
 
 
+async def safe_cancel_many(
+    tasks: Iterable[asyncio.Task], info: str, cancel_wait_timeout: Union[int, float] = 10
+) -> Set[asyncio.Task]:
+    """
+    Cancel asyncio tasks and wait until they finish, all at once.
+
+    Unlike :py:func:`safe_cancel`, cancellation isn't retried: tasks which didn't finish within the timeout are
+    returned.
+
+    :param tasks: tasks to cancel
+    :param info: some additional info to log when cancelling tasks
+    :param cancel_wait_timeout: how many seconds wait for all tasks to cancel
+    :return: tasks which failed to stop
+    """
+    tasks = set(tasks)
+    if not tasks:
+        return set()
+    for task in tasks:
+        task.cancel()
+    log.debug(f"Task cancel request sent to {len(tasks)} tasks, additional info: {info}")
+
+    _, pending = await asyncio.wait(tasks, timeout=cancel_wait_timeout)
+    for task in pending:
+        log.warning(f"Task failed to stop: {task}, additional task info: {info}")
+    log.info(f"Tasks cancelled: {len(tasks) - len(pending)} of {len(tasks)}, additional info: {info}")
+    return pending
+
+
+class RestartPolicy(StrEnum):
+    ALWAYS = auto()  # restart a task when it fails or returns
+    ON_FAILURE = auto()  # restart a task only when it fails
+
+
+class SupervisedTaskStats(NamedTuple):
+    restarts: int
+    uptime: float  # seconds since the last (re)start, 0 if the task is not running
+    running: bool
+
+
+class _SupervisedTask:
+    def __init__(self, name: str, coro_func: Callable[[], Awaitable], policy: RestartPolicy):
+        self.name = name
+        self.coro_func = coro_func
+        self.policy = policy
+        self.task: Optional[asyncio.Task] = None
+        self.restarts = 0
+        self.restart_times: Deque[float] = deque()
+        self.started_at: Optional[float] = None  # None when coroutine isn't running, e.g. during a backoff delay
+
+
+class Supervisor:
+    """
+    Run named long-living tasks, restarting them with exponential backoff when they fail.
+
+    A task which restarts more than ``max_restarts`` times within ``restart_window`` seconds is given up on, to avoid
+    restart storms. Intended to be used as a context manager, which cancels all tasks on exit (see :py:meth:`stop`):
+
+    .. code-block:: python
+
+        async with Supervisor() as supervisor:
+            supervisor.start("update_last_success", liveness_api.update_last_success_loop)
+            supervisor.start("snapshots", snapshot_loop, policy=RestartPolicy.ALWAYS)
+            await stop_event.wait()
+    """
+
+    def __init__(
+        self,
+        max_restarts: int = 10,
+        restart_window: float = 60,
+        backoff_base: float = 1,
+        backoff_max: float = 60,
+        jitter: float = 0.1,
+    ):
+        """
+        :param max_restarts: maximum number of restarts of a task within restart window
+        :param restart_window: restart window size, seconds
+        :param backoff_base: delay before the first restart, doubles on each consecutive restart
+        :param backoff_max: maximum delay before a restart. A task which has been running for this long is considered
+            healthy, and the delay is reset to ``backoff_base``
+        :param jitter: randomize a delay by this fraction, so that tasks failing together don't restart together
+        """
+        self._max_restarts = max_restarts
+        self._restart_window = restart_window
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._jitter = jitter
+        self._tasks: Dict[str, _SupervisedTask] = {}
+
+    def start(
+        self,
+        name: str,
+        coro_func: Callable[[], Awaitable],
+        policy: RestartPolicy = RestartPolicy.ON_FAILURE,
+    ) -> None:
+        """
+        Start a supervised task.
+
+        :param name: unique task name
+        :param coro_func: a function to create a coroutine, it's called on every (re)start
+        :param policy: when to restart a task
+        """
+        existing = self._tasks.get(name)
+        if existing is not None and existing.task is not None and not existing.task.done():
+            raise ValueError(f"Task {name} is already running")
+        supervised = _SupervisedTask(name, coro_func, policy)
+        supervised.task = safe_ensure_future(self._supervise(supervised))
+        self._tasks[name] = supervised
+
+    async def stop(self, cancel_wait_timeout: Union[int, float] = 10) -> Set[str]:
+        """
+        Cancel all supervised tasks and wait until they finish.
+
+        :return: names of tasks which failed to stop within the timeout
+        """
+        running = self._running_tasks()
+        pending = await safe_cancel_many(running.values(), "supervised tasks", cancel_wait_timeout)
+        return {name for name, task in running.items() if task in pending}
+
+    def stats(self) -> Dict[str, SupervisedTaskStats]:
+        """Return restart count and uptime of every supervised task."""
+        now = time.monotonic()
+        running = self._running_tasks()
+        return {
+            name: SupervisedTaskStats(
+                restarts=s.restarts,
+                uptime=now - s.started_at if s.started_at is not None else 0,
+                running=name in running,
+            )
+            for name, s in self._tasks.items()
+        }
+
+    async def __aenter__(self) -> "Supervisor":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+
+    def _running_tasks(self) -> Dict[str, asyncio.Task]:
+        return {name: s.task for name, s in self._tasks.items() if s.task is not None and not s.task.done()}
+
+    def _backoff_delay(self, consecutive_restarts: int) -> float:
+        delay = min(self._backoff_max, self._backoff_base * 2**consecutive_restarts)
+        return delay * (1 + random.uniform(-self._jitter, self._jitter))  # noqa: DUO102
+
+    async def _supervise(self, supervised: _SupervisedTask) -> None:
+        consecutive_restarts = 0
+        while True:
+            supervised.started_at = time.monotonic()
+            try:
+                await supervised.coro_func()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.error(f"Supervised task {supervised.name} failed.", exc_info=True)
+            else:
+                if supervised.policy == RestartPolicy.ON_FAILURE:
+                    log.info(f"Supervised task {supervised.name} finished.")
+                    return
+            finally:
+                now = time.monotonic()
+                uptime = now - supervised.started_at
+                supervised.started_at = None
+
+            while supervised.restart_times and supervised.restart_times[0] < now - self._restart_window:
+                supervised.restart_times.popleft()
+            if len(supervised.restart_times) >= self._max_restarts:
+                log.error(
+                    f"Supervised task {supervised.name} restarted {len(supervised.restart_times)} times within "
+                    f"{self._restart_window}s, giving up."
+                )
+                return
+            if uptime >= self._backoff_max:
+                consecutive_restarts = 0
+            delay = self._backoff_delay(consecutive_restarts)
+            log.info(f"Restarting supervised task {supervised.name} in {delay:.2f}s.")
+            await asyncio.sleep(delay)
+            consecutive_restarts += 1
+            supervised.restarts += 1
+            supervised.restart_times.append(time.monotonic())
+
+
 def calc_delay_til_next_tick(seconds: float) -> float:
     """Calculate the delay to next tick."""
     now: float = time.time()
@@ -154,6 +717,105 @@ async def wait_til_next_tick(seconds: float = 1.0) -> None:
     await asyncio.sleep(delay)
 
 
+class TickDispatcher:
+    """
+    Wake up many waiters of the same quantized time interval using a single timer.
+
+    A replacement of :py:func:`wait_til_next_tick` for a large number of coroutines: instead of a timer handle per
+    coroutine, there's one timer per tick, which wakes up all waiters at once. Use one dispatcher per event loop.
+
+    .. code-block:: python
+
+        dispatcher = TickDispatcher()
+
+        async def market_loop(market: str) -> None:
+            while True:
+                await dispatcher.wait_til_next_tick(1.0)
+                update(market)
+    """
+
+    def __init__(self):
+        self._ticks: Dict[Tuple[float, int], asyncio.Event] = {}
+
+    @property
+    def scheduled_ticks(self) -> int:
+        """Return the number of pending timers."""
+        return len(self._ticks)
+
+    async def wait_til_next_tick(self, seconds: float = 1.0) -> None:
+        """Wait until the end of quantized time interval."""
+        now: float = time.time()
+        next_tick: int = int(now // seconds) + 1
+        key = (seconds, next_tick)
+        event = self._ticks.get(key)
+        if event is None:
+            event = self._ticks[key] = asyncio.Event()
+            asyncio.get_running_loop().call_later(next_tick * seconds - now, self._fire, key)
+        await event.wait()
+
+    def _fire(self, key: Tuple[float, int]) -> None:
+        self._ticks.pop(key).set()
+
+
+class TickPolicy(StrEnum):
+    SKIP = auto()  # drop missed ticks, wait for the next one
+    CATCH_UP = auto()  # deliver every missed tick immediately
+    COALESCE = auto()  # deliver missed ticks as a single tick immediately
+
+
+class Tick(NamedTuple):
+    scheduled: float  # scheduled tick time, event loop clock
+    lateness: float  # how late the tick was delivered, seconds
+    missed: int  # how many ticks were dropped or coalesced since the previous one
+
+
+async def ticker(
+    seconds: float = 1.0,
+    align: bool = True,
+    policy: TickPolicy = TickPolicy.SKIP,
+) -> AsyncGenerator[Tick, None]:
+    """
+    Generate periodic ticks, without drift.
+
+    Ticks are scheduled using event loop monotonic clock, so they're not affected by wall clock adjustments, and time
+    spent by a consumer doesn't shift subsequent ticks. Tick lateness shows event loop lag (or consumer overrun).
+
+    .. code-block:: python
+
+        async for tick in ticker(60):
+            if tick.missed:
+                log.warning(f"Missed {tick.missed} snapshots")
+            await take_snapshot()
+
+    :param seconds: tick interval
+    :param align: align ticks to the end of quantized wall clock interval, like :py:func:`wait_til_next_tick`.
+        Otherwise, the first tick happens in ``seconds``
+    :param policy: what to do with ticks which were missed because a consumer or the event loop were busy
+    """
+    loop = asyncio.get_running_loop()
+    scheduled = loop.time() + (calc_delay_til_next_tick(seconds) if align else seconds)
+    missed = 0
+    while True:
+        now = loop.time()
+        if now < scheduled:
+            await asyncio.sleep(scheduled - now)
+            now = loop.time()
+        # Event loop could wake up a bit earlier, within its clock resolution
+        lateness = max(0.0, now - scheduled)
+        behind = int(lateness // seconds)  # how many more ticks are already due
+        if behind and policy == TickPolicy.SKIP:
+            missed += behind + 1
+            scheduled += (behind + 1) * seconds
+            continue
+        if behind and policy == TickPolicy.COALESCE:
+            missed += behind
+            scheduled += behind * seconds
+            lateness -= behind * seconds
+        yield Tick(scheduled, lateness, missed)
+        missed = 0
+        scheduled += seconds
+
+
 def task_callback(task: asyncio.Task) -> None:
     """
     Helper to terminate background asyncio task in test, on failure.
@@ -1,11 +1,32 @@
+import functools
+import gzip
 import json
+import keyword
+import os
+import re
+from contextlib import contextmanager
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum
-from typing import Any, Dict, NamedTuple, Set, Tuple
+from types import MappingProxyType
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple, cast
 
+import numpy as np
 import pandas as pd
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+
+_IMMUTABLE_TYPES = (str, bytes, int, float, complex, Decimal, datetime, tuple, frozenset, type(None))
+
 
 class JSONTemplateField(NamedTuple):
     value_key: str  # original key for the value form the exchange message
@@ -17,11 +38,64 @@ class JSONTemplateField(NamedTuple):
     def default_value(self):
         return self.encode_type(self.value_type())
 
+    @property
+    def has_immutable_default(self) -> bool:
+        """Check if default values could be created once and shared, unlike e.g. lists, or Enums without defaults."""
+        try:
+            return isinstance(self.value_type(), _IMMUTABLE_TYPES) and isinstance(self.default_value, _IMMUTABLE_TYPES)
+        except Exception:
+            return False
+
+
+def _compile_function(name: str, body: str, namespace: Dict[str, Any]) -> Callable:
+    """Compile a function from source, like dataclasses and namedtuple do."""
+    exec(body, namespace)  # noqa: DUO105 the source is generated from reprs of template fields
+    return namespace[name]
+
+
+def _compile_lookup(namespace: Dict[str, Any], index: int, container: str, key: str, default: Callable[[], Any]) -> str:
+    """
+    Return an expression getting a value from a dict by key, or a default value if the key is missing.
+
+    The default value is created once, at compilation. If it can't be created, e.g. for an Enum type, which has no
+    constructor without arguments, it is created on every miss, so that the error is raised only for a missing key.
+    """
+    try:
+        namespace[f"_default_{index}"] = default()
+    except Exception:
+        namespace[f"_default_factory_{index}"] = default
+        return f"({container}[{key!r}] if {key!r} in {container} else _default_factory_{index}())"
+    return f"{container}.get({key!r}, _default_{index})"
+
 
 class JSONTemplate:
+    """
+    Template of a JSON message, e.g. of an exchange feed.
+
+    Decoding and encoding functions are compiled for the template fields once, so that converting a message is a
+    single dict display, without per-field lookups in Python:
+
+    .. code-block:: python
+
+        template = JSONTemplate({("p", str, Decimal, "price"), ("q", str, Decimal, "amount")})
+        template.decode({"p": "42000.1", "q": "0.5"})  # {"amount": Decimal("0.5"), "price": Decimal("42000.1")}
+        template.decode_frame(messages)  # a DataFrame with "amount" and "price" columns
+    """
+
     def __init__(self, template_field_tuples: Set[Tuple[str, type, type, str]]):
         self._fields: Set[JSONTemplateField] = {JSONTemplateField(*field) for field in template_field_tuples}
         self._name_key_map: Dict[str, Any] = {f.value_name: f.value_key for f in self._fields}
+        # Sorted for a stable order of decoded keys and columns
+        self._sorted_fields: List[JSONTemplateField] = sorted(self._fields, key=lambda f: f.value_name)
+        self._decode: Callable[[Dict[str, Any]], Dict[str, Any]] = self._compile_decode()
+        self._encode: Callable[[Dict[str, Any]], Dict[str, Any]] = self._compile_encode()
+        # Defaults are cached on first use, since a value type may have no constructor without arguments, e.g. an Enum
+        self._default_dict: Optional[Dict[str, Any]] = None
+        self._default_mapping: Optional[Mapping[str, Any]] = None
+        # Fields with mutable defaults, e.g. lists, which are created for every dict and record
+        self._mutable_default_fields: List[JSONTemplateField] = []
+        self._record_type: Optional[type] = None
+        self._decode_record: Optional[Callable[[Dict[str, Any]], Any]] = None
 
     @property
     def name_key_map(self):
@@ -29,12 +103,188 @@ class JSONTemplate:
 
     @property
     def default_dict(self) -> Dict[str, Any]:
-        return self.get_default_template_dict(self._fields)
+        """
+        Return a new dict of default values by keys.
+
+        Immutable defaults are copied from the dict computed on first use, mutable ones, e.g. lists, are new.
+        """
+        defaults = self._cached_default_dict().copy()
+        for field in self._mutable_default_fields:
+            defaults[str(field.value_key)] = field.default_value
+        return defaults
+
+    @property
+    def default_mapping(self) -> Mapping[str, Any]:
+        """Return a read-only mapping of default values by keys, without copying, so mutable values are shared."""
+        if self._default_mapping is None:
+            self._default_mapping = MappingProxyType(self._cached_default_dict())
+        return self._default_mapping
+
+    @property
+    def record_type(self) -> type:
+        """
+        Return a compact record type with a slot per value name, e.g. to keep decoded messages.
+
+        Records are mutable, could be created with values as keyword arguments or by :py:meth:`decode_record`, and
+        missing values are defaults of value types.
+        """
+        if self._record_type is None:
+            self._record_type = self._compile_record_type()
+        return self._record_type
 
     @classmethod
     def get_default_template_dict(cls, template_fields: Set[JSONTemplateField]) -> Dict[str, Any]:
         return {str(f.value_key): f.default_value for f in template_fields}
 
+    def decode(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert a raw message to a dict of values by their names, coerced to value types.
+
+        Missing keys get default values.
+
+        :param message: raw message, e.g. parsed from JSON
+        """
+        return self._decode(message)
+
+    def encode(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert a dict of values by their names to a raw message, coerced to encode types.
+
+        Missing names get default values.
+
+        :param record: values by their names, e.g. returned by :py:meth:`decode`
+        """
+        return self._encode(record)
+
+    def decode_record(self, message: Dict[str, Any]) -> Any:
+        """
+        Convert a raw message to an instance of :py:attr:`record_type`, coercing values to value types.
+
+        :param message: raw message, e.g. parsed from JSON
+        """
+        if self._decode_record is None:
+            self._decode_record = self._compile_decode_record()
+        return self._decode_record(message)
+
+    def decode_columns(self, messages: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """
+        Convert raw messages to columns of values by their names.
+
+        Columns of int and float value types are parsed by NumPy in bulk, others are object arrays.
+
+        :param messages: raw messages
+        """
+        columns: Dict[str, np.ndarray] = {}
+        for field in self._sorted_fields:
+            key = field.value_key
+            try:
+                default = field.default_value
+            except Exception:
+                # Raise the error only if a message misses the key, like decode() does
+                raw = [message[key] if key in message else field.default_value for message in messages]
+            else:
+                raw = [message.get(key, default) for message in messages]
+            if field.value_type in (int, float):
+                try:
+                    columns[field.value_name] = np.array(raw, dtype=field.value_type)
+                    continue
+                except (TypeError, ValueError, OverflowError):
+                    # Not representable by NumPy, e.g. an int above 64 bits
+                    pass
+            convert = field.value_type
+            values = np.empty(len(raw), dtype=object)
+            values[:] = [convert(value) for value in raw]
+            columns[field.value_name] = values
+        return columns
+
+    def decode_frame(self, messages: List[Dict[str, Any]]) -> pd.DataFrame:
+        """
+        Convert raw messages to a DataFrame with a column per value name.
+
+        :param messages: raw messages
+        """
+        return pd.DataFrame(self.decode_columns(messages), columns=[f.value_name for f in self._sorted_fields])
+
+    def _cached_default_dict(self) -> Dict[str, Any]:
+        if self._default_dict is None:
+            self._default_dict = self.get_default_template_dict(self._fields)
+            self._mutable_default_fields = [f for f in self._sorted_fields if not f.has_immutable_default]
+        return self._default_dict
+
+    def _compile_decode(self) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        namespace: Dict[str, Any] = {}
+        items = []
+        for i, field in enumerate(self._sorted_fields):
+            namespace[f"_convert_{i}"] = field.value_type
+            default = functools.partial(getattr, field, "default_value")
+            value = _compile_lookup(namespace, i, "message", field.value_key, default)
+            items.append(f"{field.value_name!r}: _convert_{i}({value})")
+        body = f"def decode(message):\n    return {{{', '.join(items)}}}\n"
+        return _compile_function("decode", body, namespace)
+
+    def _compile_encode(self) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        namespace: Dict[str, Any] = {}
+        items = []
+        for i, field in enumerate(self._sorted_fields):
+            namespace[f"_convert_{i}"] = field.encode_type
+            value = _compile_lookup(namespace, i, "record", field.value_name, field.value_type)
+            items.append(f"{field.value_key!r}: _convert_{i}({value})")
+        body = f"def encode(record):\n    return {{{', '.join(items)}}}\n"
+        return _compile_function("encode", body, namespace)
+
+    def _compile_record_type(self) -> type:
+        names = [f.value_name for f in self._sorted_fields]
+        invalid_names = [name for name in names if not name.isidentifier() or keyword.iskeyword(name)]
+        if invalid_names:
+            raise ValueError(f"Value names should be identifiers to create a record type, got {invalid_names}")
+        namespace: Dict[str, Any] = {"_missing": object()}
+        arguments = []
+        assignments = ""
+        for i, field in enumerate(self._sorted_fields):
+            name = field.value_name
+            if field.has_immutable_default:
+                namespace[f"_default_{i}"] = field.value_type()
+                arguments.append(f"{name}=_default_{i}")
+                assignments += f"    self.{name} = {name}\n"
+            else:
+                # A mutable default is created for every record, like a dataclass field with default_factory
+                namespace[f"_factory_{i}"] = field.value_type
+                arguments.append(f"{name}=_missing")
+                assignments += f"    self.{name} = _factory_{i}() if {name} is _missing else {name}\n"
+        body = f"def __init__(self, {', '.join(arguments)}):\n{assignments or '    pass'}\n"
+
+        def record_repr(record: Any) -> str:
+            values = ", ".join(f"{name}={getattr(record, name)!r}" for name in names)
+            return f"{type(record).__name__}({values})"
+
+        def record_eq(record: Any, other: Any) -> bool:
+            if type(other) is not type(record):
+                return NotImplemented
+            return all(getattr(record, name) == getattr(other, name) for name in names)
+
+        def record_asdict(record: Any) -> Dict[str, Any]:
+            return {name: getattr(record, name) for name in names}
+
+        attributes = {
+            "__slots__": tuple(names),
+            "__init__": _compile_function("__init__", body, namespace),
+            "__repr__": record_repr,
+            "__eq__": record_eq,
+            "_asdict": record_asdict,
+        }
+        return type("JSONTemplateRecord", (), attributes)
+
+    def _compile_decode_record(self) -> Callable[[Dict[str, Any]], Any]:
+        namespace: Dict[str, Any] = {"_record_type": self.record_type}
+        arguments = []
+        for i, field in enumerate(self._sorted_fields):
+            namespace[f"_convert_{i}"] = field.value_type
+            default = functools.partial(getattr, field, "default_value")
+            value = _compile_lookup(namespace, i, "message", field.value_key, default)
+            arguments.append(f"_convert_{i}({value})")
+        body = f"def decode_record(message):\n    return _record_type({', '.join(arguments)})\n"
+        return _compile_function("decode_record", body, namespace)
+
 
 def to_valid_json_dict(dictionary: Any, decimal_to_str: bool = False, enum_to_name: bool = True) -> Any:
     """
@@ -60,43 +310,212 @@ def to_valid_json_dict(dictionary: Any, decimal_to_str: bool = False, enum_to_na
     return dictionary
 
 
-def json_encode_default(obj: Any) -> Dict[str, Any]:
+def _fast_encode_default(decimal_to_str: bool, enum_to_name: bool) -> Callable[[Any], Any]:
+    def default(obj: Any) -> Any:
+        if isinstance(obj, Decimal):
+            return str(obj) if decimal_to_str else float(obj)
+        if isinstance(obj, Enum):
+            return obj.name if enum_to_name else obj.value
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        if isinstance(obj, set):
+            return list(obj)
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    return default
+
+
+_FAST_ENCODE_DEFAULTS: Dict[Tuple[bool, bool], Callable[[Any], Any]] = {
+    (decimal_to_str, enum_to_name): _fast_encode_default(decimal_to_str, enum_to_name)
+    for decimal_to_str in (False, True)
+    for enum_to_name in (False, True)
+}
+
+# Without OPT_NON_STR_KEYS, orjson rejects dicts with keys other than str, and the stdlib encodes them instead: with the
+# option orjson would accept keys which the stdlib rejects, e.g. Enums and datetimes
+_ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson is not None else 0
+# orjson output which may differ from the stdlib one: floats in exponent notation, e.g. 1e16 vs 1e+16, floats below
+# 1e-4, e.g. 0.00001 vs 1e-05, and non-finite floats, which orjson serializes as null
+_ORJSON_MISMATCH = re.compile(rb"\de|0\.0000|null")
+_NO_ENUM_TYPES = frozenset({str, int, float, bool, type(None), Decimal})
+
+
+def _enums_to_names(obj: Any) -> Any:
+    """
+    Replace Enums in a structure with their names, including Enums mixed with str or int.
+
+    Containers are copied only if they hold Enums, at any depth, otherwise they are returned as is.
     """
-    JSON encoder to provide serialization for additional types.
+    if isinstance(obj, dict):
+        converted_dict = None
+        for key, value in obj.items():
+            if type(value) in _NO_ENUM_TYPES:
+                continue
+            converted = _enums_to_names(value)
+            if converted is not value:
+                if converted_dict is None:
+                    converted_dict = dict(obj)
+                converted_dict[key] = converted
+        return obj if converted_dict is None else converted_dict
+    if isinstance(obj, (list, tuple, set)):
+        converted_list = None
+        for index, value in enumerate(obj):
+            if type(value) in _NO_ENUM_TYPES:
+                continue
+            converted = _enums_to_names(value)
+            if converted is not value:
+                if converted_list is None:
+                    converted_list = list(obj)
+                converted_list[index] = converted
+        return obj if converted_list is None else converted_list
+    if isinstance(obj, Enum):
+        return obj.name
+    return obj
 
-    Example usage:
 
-    .. code-block:: python
+def dumps_fast(obj: Any, decimal_to_str: bool = False, enum_to_name: bool = True) -> str:
+    """
+    Serialize a structure into a compact JSON string.
 
-        json.dump(obj, fd, indent=4, default=json_encode_default)
+    A faster alternative to ``json.dumps(to_valid_json_dict(obj))``, which converts Decimals and Enums the same way, and
+    also serializes datetimes and pd.Timestamps in ISO format. The output is the same as of ``json.dumps`` with compact
+    separators and ``ensure_ascii=False``. If orjson is installed, it encodes the structure first, and its output is
+    used unless it has tokens which the stdlib may serialize differently, like floats in exponent notation or ``null``
+    (orjson serializes non-finite floats as ``null``). Such tokens inside strings, dicts with keys other than str and
+    integers over 64 bits also switch to the stdlib, which is slower, but gives the same output.
 
-    :param obj: object to serialize
+    Only ``enum_to_name=False`` serializes in a single pass. With ``enum_to_name=True``, Enums are replaced with names
+    in another pass over the structure, since both backends serialize Enums mixed with str or int, like
+    :py:class:`birdfeeder.enum.str_enum.StrEnum`, by value, and orjson serializes all Enums by value. The pass copies
+    only containers which hold Enums.
+
+    :param obj: a structure to serialize
+    :param decimal_to_str: convert Decimal to string if True, and to float if False
+    :param enum_to_name: convert Enum attribute to it's name if True, and to value if False
     """
-    if isinstance(obj, Decimal):
-        return {'type(Decimal)': str(obj)}
-    elif isinstance(obj, pd.Timestamp):
-        return {'type(pd.Timestamp)': str(obj)}
-    elif isinstance(obj, datetime):
-        return {'type(datetime)': obj.isoformat()}
-    else:
-        raise TypeError(f"{repr(obj)} is not JSON serializable")
+    if enum_to_name:
+        obj = _enums_to_names(obj)
+    default = _FAST_ENCODE_DEFAULTS[bool(decimal_to_str), bool(enum_to_name)]
+    if orjson is not None:
+        try:
+            encoded = orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # E.g. keys other than str or integers over 64 bits, or objects which the stdlib rejects as well
+            pass
+        else:
+            if not _ORJSON_MISMATCH.search(encoded):
+                return encoded.decode()
+    return json.dumps(obj, default=default, separators=(",", ":"), ensure_ascii=False)
 
 
-def json_decode_hook(obj: Any) -> Any:
+class JSONCodec:
     """
-    JSON decode hook to deserialize additional types.
+    Registry of JSON encoders and decoders for additional types.
+
+    An object of a registered type is encoded as ``{"__type__": name, "__value__": encoded_value}``. Encoders are
+    looked up by exact type first, then by base classes in MRO order. On decoding, a plain dict costs a single key
+    lookup, plus another one for dicts of one key, which could be tagged in the legacy ``{"type(Decimal)": value}``
+    format.
+
+    Example of registering NumPy arrays in the default codec:
 
     .. code-block:: python
 
-        json.load(fd, object_hook=json_decode_hook)
+        default_codec.register(np.ndarray, "np.ndarray", np.ndarray.tolist, np.array)
+        json.dumps(obj, default=json_encode_default)
     """
-    if 'type(Decimal)' in obj:
-        return Decimal(obj['type(Decimal)'])
-    elif 'type(pd.Timestamp)' in obj:
-        return pd.Timestamp(obj['type(pd.Timestamp)'])
-    elif 'type(datetime)' in obj:
-        return datetime.fromisoformat(obj['type(datetime)'])
-    return obj
+
+    def __init__(self) -> None:
+        self._encoders: Dict[type, Tuple[str, Callable[[Any], Any]]] = {}
+        # Encoders of registered types and their subclasses, resolved through MRO
+        self._resolved_encoders: Dict[type, Optional[Tuple[str, Callable[[Any], Any]]]] = {}
+        self._decoders: Dict[str, Callable[[Any], Any]] = {}
+        self._legacy_decoders: Dict[str, Callable[[Any], Any]] = {}
+
+    def register(
+        self,
+        cls: type,
+        name: str,
+        encode: Callable[[Any], Any],
+        decode: Callable[[Any], Any],
+        legacy_tags: Iterable[str] = (),
+    ) -> None:
+        """
+        Register a type.
+
+        :param cls: type to encode, also used for its subclasses unless they're registered separately
+        :param name: unique name of the type, stored in JSON
+        :param encode: a function to convert an object to a JSON-serializable value
+        :param decode: a function to convert an encoded value back to an object
+        :param legacy_tags: keys of single-key dicts which hold values of the type in older formats
+        """
+        self._encoders[cls] = (name, encode)
+        self._resolved_encoders.clear()
+        self._decoders[name] = decode
+        for tag in legacy_tags:
+            self._legacy_decoders[tag] = decode
+
+    def encode_default(self, obj: Any) -> Dict[str, Any]:
+        """
+        JSON encoder default function, to be passed as ``default`` to :py:func:`json.dump`.
+
+        :param obj: object to serialize
+        """
+        encoder = self._encoders.get(type(obj)) or self._resolve_encoder(type(obj))
+        if encoder is None:
+            raise TypeError(f"{repr(obj)} is not JSON serializable")
+        name, encode = encoder
+        return {"__type__": name, "__value__": encode(obj)}
+
+    def decode_hook(self, obj: Dict[str, Any]) -> Any:
+        """
+        JSON decode hook, to be passed as ``object_hook`` to :py:func:`json.load`.
+
+        :param obj: decoded dict
+        """
+        # Called for every decoded dict, so plain dicts should cost as little as possible
+        if "__type__" in obj:
+            decode = self._decoders.get(obj["__type__"])
+            if decode is not None and len(obj) == 2 and "__value__" in obj:
+                return decode(obj["__value__"])
+        elif len(obj) == 1 and self._legacy_decoders:
+            for tag in obj:
+                decode = self._legacy_decoders.get(tag)
+                if decode is not None:
+                    return decode(obj[tag])
+        return obj
+
+    def _resolve_encoder(self, cls: type) -> Optional[Tuple[str, Callable[[Any], Any]]]:
+        try:
+            return self._resolved_encoders[cls]
+        except KeyError:
+            pass
+        encoder = next((self._encoders[base] for base in cls.__mro__ if base in self._encoders), None)
+        self._resolved_encoders[cls] = encoder
+        return encoder
+
+
+default_codec = JSONCodec()
+default_codec.register(Decimal, "Decimal", str, Decimal, legacy_tags=("type(Decimal)",))
+default_codec.register(pd.Timestamp, "pd.Timestamp", str, pd.Timestamp, legacy_tags=("type(pd.Timestamp)",))
+default_codec.register(
+    datetime, "datetime", datetime.isoformat, datetime.fromisoformat, legacy_tags=("type(datetime)",)
+)
+
+
+#: JSON encoder to provide serialization for additional types, registered in :py:data:`default_codec`:
+#:
+#: .. code-block:: python
+#:
+#:     json.dump(obj, fd, indent=4, default=json_encode_default)
+json_encode_default: Callable[[Any], Dict[str, Any]] = default_codec.encode_default
+
+#: JSON decode hook to deserialize additional types, registered in :py:data:`default_codec`:
+#:
+#: .. code-block:: python
+#:
+#:     json.load(fd, object_hook=json_decode_hook)
+json_decode_hook: Callable[[Any], Any] = default_codec.decode_hook
 
 
 def dump_to_file_as_json(obj: Any, path: str) -> None:
@@ -116,3 +535,186 @@ def load_json_from_file(path: str) -> Any:
     """Load a JSON object from a file."""
     with open(path, "r") as fd:
         return json.load(fd, object_hook=json_decode_hook)
+
+
+def _infer_compression(path: str, compression: Optional[str]) -> Optional[str]:
+    if compression != "infer":
+        return compression
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def _open_text(path: str, mode: str, compression: Optional[str]) -> IO[str]:
+    """Open a text file, compressed with gzip or zstd, or not compressed if compression is None."""
+    if compression is None:
+        return open(path, mode, encoding="utf-8")
+    if compression == "gzip":
+        return cast(IO[str], gzip.open(path, mode + "t", encoding="utf-8"))
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard package is required for zstd compression")
+        return zstandard.open(path, mode + "t", encoding="utf-8")
+    raise ValueError(f"Unknown compression {compression}, expected gzip, zstd, infer or None")
+
+
+@contextmanager
+def _atomic_write(path: str, compression: Optional[str]) -> Iterator[IO[str]]:
+    """Write to a temporary file and rename it to path on success, so that readers never see a partial file."""
+    directory, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{name}.{os.urandom(8).hex()}.tmp")
+    # Unlike tempfile.mkstemp, which creates a file readable only by the owner, the umask applies, as with open(), so
+    # the renamed file gets the usual permissions
+    fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+    try:
+        try:
+            with _open_text(tmp_path, "w", compression) as file:
+                yield file
+            # The file must be on disk before the rename, otherwise a crash could leave an empty file under path
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def dump_to_file_as_jsonl(records: Iterable[Any], path: str, compression: Optional[str] = "infer") -> int:
+    """
+    Dump python objects to a file in JSON Lines format, one at a time.
+
+    Records are serialized with :py:data:`json_encode_default`. The file is written atomically: it appears under
+    ``path`` only when all records are written.
+
+    :param records: python objects, e.g. a generator
+    :param path: output file path
+    :param compression: gzip, zstd, None, or infer from the path extension (.gz or .zst)
+    :return: number of records written
+    """
+    count = 0
+    with _atomic_write(path, _infer_compression(path, compression)) as file:
+        for record in records:
+            file.write(json.dumps(record, default=json_encode_default))
+            file.write("\n")
+            count += 1
+    return count
+
+
+def iter_jsonl_file(path: str, compression: Optional[str] = "infer") -> Iterator[Any]:
+    """
+    Load python objects from a file in JSON Lines format, one at a time.
+
+    Records are deserialized with :py:data:`json_decode_hook`, empty lines are skipped.
+
+    :param path: input file path
+    :param compression: gzip, zstd, None, or infer from the path extension (.gz or .zst)
+    """
+    with _open_text(path, "r", _infer_compression(path, compression)) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line, object_hook=json_decode_hook)
+
+
+_PARTIAL_NUMBER = re.compile(r"[-+.eE0-9]*")
+_JSON_CONSTANTS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+
+
+def _is_truncated_json(error: json.JSONDecodeError) -> bool:
+    """Check if a decoding error is caused by the end of the document, i.e. could be fixed by reading more data."""
+    pos = error.pos
+    rest = error.doc[pos:]
+    if error.msg.startswith("Unterminated string"):
+        return True
+    if error.msg.startswith("Invalid \\uXXXX escape"):
+        return len(rest) <= len("uXXXX")
+    return _PARTIAL_NUMBER.fullmatch(rest) is not None or any(constant.startswith(rest) for constant in _JSON_CONSTANTS)
+
+
+def iter_json_array_file(path: str, compression: Optional[str] = "infer", chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """
+    Load items of a top-level JSON array from a file, one at a time.
+
+    Unlike :py:func:`load_json_from_file`, memory usage is bounded by the size of a single item and ``chunk_size``.
+    Items are deserialized with :py:data:`json_decode_hook`. Positions in decoding errors are relative to the whole
+    file.
+
+    :param path: input file path
+    :param compression: gzip, zstd, None, or infer from the path extension (.gz or .zst)
+    :param chunk_size: number of characters to read at once
+    """
+    decoder = json.JSONDecoder(object_hook=json_decode_hook)
+    with _open_text(path, "r", _infer_compression(path, compression)) as file:
+        buffer = ""
+        pos = 0
+        eof = False
+        # Position of the buffer start in the file
+        offset = 0
+        line = 1
+        column = 1
+
+        def read_more() -> None:
+            nonlocal buffer, pos, eof, offset, line, column
+            consumed = buffer[:pos]
+            newlines = consumed.count("\n")
+            if newlines:
+                line += newlines
+                column = len(consumed) - consumed.rindex("\n")
+            else:
+                column += len(consumed)
+            offset += len(consumed)
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def next_char() -> str:
+            """Skip whitespace and return the next character, or an empty string at EOF."""
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\n\r":
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if eof:
+                    return ""
+                read_more()
+
+        def file_error(error: json.JSONDecodeError) -> json.JSONDecodeError:
+            """Return a decoding error of the buffer with the position in the file."""
+            adjusted = json.JSONDecodeError(error.msg, error.doc, error.pos)
+            adjusted.pos += offset
+            if adjusted.lineno == 1:
+                adjusted.colno += column - 1
+            adjusted.lineno += line - 1
+            adjusted.args = (f"{error.msg}: line {adjusted.lineno} column {adjusted.colno} (char {adjusted.pos})",)
+            return adjusted
+
+        if next_char() != "[":
+            raise ValueError(f"{path} doesn't contain a JSON array")
+        pos += 1
+        if next_char() == "]":
+            return
+        while True:
+            next_char()
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as error:
+                if eof or not _is_truncated_json(error):
+                    raise file_error(error) from None
+                read_more()
+                continue
+            if not eof and _PARTIAL_NUMBER.fullmatch(buffer, end):
+                # An item at the end of the buffer could be incomplete, e.g. 1 of 1.5
+                read_more()
+                continue
+            yield item
+            pos = end
+            separator = next_char()
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' after item of JSON array in {path}")
+            pos += 1
@@ -1,9 +1,33 @@
+import math
+import threading
 import time
-from collections import deque
-from typing import Callable, Deque, Iterable, NamedTuple, Union
+from array import array
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Sized,
+    Tuple,
+    Union,
+)
+
+import numpy as np
 
 from .typing_local import Timestamp_ms
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class TimedMetricItem(NamedTuple):
     """Holds a metric item."""
@@ -28,11 +52,158 @@ def average(items: Iterable[TimedMetricItem]) -> float:
     return float(sum(i.value for i in items) / len(items))
 
 
+def variance(items: Iterable[TimedMetricItem]) -> float:
+    """Compute a population variance of values."""
+    values = [i.value for i in items]
+    mean = sum(values) / len(values)
+    return float(sum((v - mean) ** 2 for v in values) / len(values))
+
+
+def minimum(items: Iterable[TimedMetricItem]) -> Union[int, float]:
+    """Compute a minimum of values."""
+    return min(i.value for i in items)
+
+
+def maximum(items: Iterable[TimedMetricItem]) -> Union[int, float]:
+    """Compute a maximum of values."""
+    return max(i.value for i in items)
+
+
+def quantile(items: Iterable[TimedMetricItem], fraction: float) -> Union[int, float]:
+    """Compute a quantile of values, given as a fraction from 0 to 1 (lower nearest rank), by sorting them."""
+    values = sorted(i.value for i in items)
+    if not values:
+        raise ValueError("quantile of an empty window")
+    return values[int(fraction * (len(values) - 1))]
+
+
+class DDSketch:
+    """
+    Approximate quantile sketch with relative accuracy guarantee, which supports removal of values.
+
+    Values are counted in logarithmically-sized buckets, see https://arxiv.org/abs/1908.10693. Memory depends on the
+    range of values, not on their number: with 1% accuracy, values from 1 microsecond to 1 hour take ~1100 buckets.
+    """
+
+    _min_indexable_value = 1e-9  # values closer to zero are counted as zero
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """:param relative_accuracy: maximum relative error of a quantile value"""
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy should be between 0 and 1, got {relative_accuracy}")
+        self._gamma: float = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma: float = math.log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self._zero_count: int = 0
+        self._count: int = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def num_buckets(self) -> int:
+        return len(self._positive) + len(self._negative)
+
+    def add(self, value: Union[int, float]) -> None:
+        """Count a value."""
+        buckets = self._buckets(value)
+        if buckets is None:
+            self._zero_count += 1
+        else:
+            index = self._index(value)
+            buckets[index] = buckets.get(index, 0) + 1
+        self._count += 1
+
+    def remove(self, value: Union[int, float]) -> None:
+        """Remove a value, which has been added before."""
+        buckets = self._buckets(value)
+        if buckets is None:
+            self._zero_count -= 1
+        else:
+            index = self._index(value)
+            if buckets[index] == 1:
+                del buckets[index]
+            else:
+                buckets[index] -= 1
+        self._count -= 1
+
+    def quantile(self, fraction: float) -> float:
+        """Return an approximate quantile value (lower nearest rank)."""
+        if not self._count:
+            raise ValueError("quantile of an empty sketch")
+        rank = int(fraction * (self._count - 1))
+        seen = 0
+        for index in sorted(self._negative, reverse=True):
+            seen += self._negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self._zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self._positive):
+            seen += self._positive[index]
+            if seen > rank:
+                return self._value(index)
+        raise AssertionError("rank is out of counted values")
+
+    def _buckets(self, value: Union[int, float]) -> Optional[Dict[int, int]]:
+        if value > self._min_indexable_value:
+            return self._positive
+        if value < -self._min_indexable_value:
+            return self._negative
+        return None
+
+    def _index(self, value: Union[int, float]) -> int:
+        return math.ceil(math.log(abs(value)) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        return 2 * self._gamma**index / (self._gamma + 1)
+
+
+# Placeholder of unused item queues, which never holds items
+_NO_ITEMS: Deque[TimedMetricItem] = deque(maxlen=0)
+
+
+def _to_list(values: Iterable) -> list:
+    """Convert values to a list, NumPy arrays are converted to Python scalars in one call."""
+    tolist = getattr(values, "tolist", None)
+    return tolist() if tolist is not None else list(values)
+
+
+def _to_array(values: Iterable) -> np.ndarray:
+    """Convert values to a float64 array, iterators without length, e.g. generators, are consumed by np.fromiter."""
+    if isinstance(values, Sized):
+        return np.asarray(values, dtype=np.float64)
+    return np.fromiter(values, dtype=np.float64)
+
+
+def _check_batch(values: Sized, timestamps: Sized) -> None:
+    """Raise ValueError if a batch has a different number of values and timestamps."""
+    if len(values) != len(timestamps):
+        raise ValueError(f"Got {len(values)} values, but {len(timestamps)} timestamps")
+
+
 class TimedAggregator:
     """
     Helper class to compute aggregated metrics.
 
     Keeps a timeseries data for a given time interval and calculates aggregated value.
+
+    Sum, count and sum of squares of values are maintained incrementally, so :py:func:`summation`, :py:func:`average`
+    and :py:func:`variance` are computed in O(1). Other aggregation functions scan the whole window. For variance,
+    values are shifted by the first value in the window, so a small spread of large values, e.g. prices, doesn't get
+    lost to floating point cancellation.
+
+    Optionally, minimum and maximum are maintained with monotonic queues (amortized O(1)), and quantiles are
+    estimated with :py:class:`DDSketch`:
+
+    .. code-block:: python
+
+        latency = TimedAggregator(60, aggregation_func=maximum, quantile_accuracy=0.01)
+        latency.add(0.012)
+        p99 = latency.quantile(0.99)
     """
 
     def __init__(
@@ -40,38 +211,1051 @@ class TimedAggregator:
         window_size_seconds: float,
         aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = summation,
         time_func: Callable[[], float] = time.time,
+        track_extremes: bool = False,
+        quantile_accuracy: Optional[float] = None,
+        ticks_per_second: int = 1,
+        eviction_threshold: int = 0,
     ):
         """
         :param window_size_seconds: aggregation window size
         :param aggregation_func: a function to compute an aggregated value
         :param time_func: a function to get current time
+        :param track_extremes: maintain minimum and maximum, implied if aggregation_func is minimum or maximum
+        :param quantile_accuracy: estimate quantiles with a sketch of given relative accuracy, instead of sorting
+        :param ticks_per_second: units of time_func per second, e.g. 10**9 for :py:func:`time.monotonic_ns`
+        :param eviction_threshold: remove obsolete values on add only if the window holds more items than that,
+            otherwise they're removed on read. Makes adding cheaper for metrics which are rarely read
         """
         self._window: Deque[TimedMetricItem] = deque()
         self._window_size_seconds: float = window_size_seconds
+        # Window size in units of time_func, kept integer for integer clocks
+        self._window_size_ticks: Union[int, float] = (
+            window_size_seconds if ticks_per_second == 1 else round(window_size_seconds * ticks_per_second)
+        )
+        self._eviction_threshold: int = eviction_threshold
         self._aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = aggregation_func
         self._time_func: Callable[[], float] = time_func
+        self._sum: Union[int, float] = 0
+        # Reference value of the shifted sums below, set by the first item added to an empty window
+        self._shift: Union[int, float] = 0
+        self._shifted_sum: Union[int, float] = 0
+        self._shifted_sum_of_squares: Union[int, float] = 0
+        self._track_extremes: bool = track_extremes or aggregation_func in (minimum, maximum)
+        # Monotonic queues of window items: values are increasing in _min_items and decreasing in _max_items. An empty
+        # deque takes ~600 bytes, so they're allocated only when needed, which matters for many small aggregators
+        self._min_items: Deque[TimedMetricItem] = deque() if self._track_extremes else _NO_ITEMS
+        self._max_items: Deque[TimedMetricItem] = deque() if self._track_extremes else _NO_ITEMS
+        self._sketch: Optional[DDSketch] = DDSketch(quantile_accuracy) if quantile_accuracy is not None else None
 
     @property
     def aggregated_value(self) -> Union[int, float]:
         """Return aggregated value using aggregation function."""
         self.remove_obsolete_values()
-        return self._aggregation_func(self._window)
+        return self._aggregate()
 
     @property
     def average_value(self) -> float:
         """Return average value."""
         self.remove_obsolete_values()
-        return average(self._window)
+        return self._average()
 
-    def remove_obsolete_values(self) -> None:
-        """Remove values which are outside of time window."""
+    @property
+    def variance_value(self) -> float:
+        """Return population variance of values."""
+        self.remove_obsolete_values()
+        return self._variance()
+
+    @property
+    def min_value(self) -> Union[int, float]:
+        """Return minimum value."""
+        self.remove_obsolete_values()
+        return self._min_value() if self._track_extremes else minimum(self._window)
+
+    @property
+    def max_value(self) -> Union[int, float]:
+        """Return maximum value."""
+        self.remove_obsolete_values()
+        return self._max_value() if self._track_extremes else maximum(self._window)
+
+    @property
+    def count(self) -> int:
+        """Return the number of items in the window."""
+        self.remove_obsolete_values()
+        return len(self._window)
+
+    @classmethod
+    def monotonic(cls, window_size_seconds: float, **kwargs: Any) -> "TimedAggregator":
+        """
+        Create an aggregator which uses integer nanoseconds of :py:func:`time.monotonic_ns` as timestamps.
+
+        Unlike :py:func:`time.time`, the monotonic clock isn't affected by system clock adjustments, which could
+        otherwise keep obsolete items in the window or empty it prematurely.
+
+        :param window_size_seconds: aggregation window size
+        :param kwargs: other arguments of the constructor
+        """
+        return cls(window_size_seconds, time_func=time.monotonic_ns, ticks_per_second=10**9, **kwargs)
+
+    def quantile(self, fraction: float) -> Union[int, float]:
+        """Return a quantile of values, approximate if quantile_accuracy is set."""
+        self.remove_obsolete_values()
+        if self._sketch is not None:
+            return self._sketch.quantile(fraction)
+        return quantile(self._window, fraction)
+
+    def remove_obsolete_values(self, now: Optional[float] = None) -> None:
+        """
+        Remove values which are outside of time window.
+
+        :param now: current time, if it's already known
+        """
+        if now is None:
+            now = self._time_func()
+        threshold = now - self._window_size_ticks
+        while len(self._window) > 0 and self._window[0].timestamp < threshold:
+            item = self._window.popleft()
+            value = item.value
+            self._sum -= value
+            shifted = value - self._shift
+            self._shifted_sum -= shifted
+            self._shifted_sum_of_squares -= shifted * shifted
+            if self._track_extremes:
+                if self._min_items[0] is item:
+                    self._min_items.popleft()
+                if self._max_items[0] is item:
+                    self._max_items.popleft()
+            if self._sketch is not None:
+                self._sketch.remove(value)
+        if not self._window:
+            # Drop accumulated floating point error
+            self._sum = self._shifted_sum = self._shifted_sum_of_squares = 0
+
+    def add(self, value: Union[int, float] = 1) -> None:
+        """Append an item to a timeseries."""
+        now: float = self._time_func()
+        if len(self._window) > self._eviction_threshold:
+            self.remove_obsolete_values(now)
+        self._append(TimedMetricItem(now, value))
+
+    def add_many(self, values: Iterable[Union[int, float]], timestamps: Optional[Iterable[float]] = None) -> None:
+        """
+        Append a batch of items to a timeseries, reading the clock and removing obsolete values only once.
+
+        :param values: values, e.g. a list or a NumPy array
+        :param timestamps: timestamps of values, in non-decreasing order and not older than already added items. By
+            default, all values get the current time
+        """
+        values = _to_list(values)
+        if timestamps is not None:
+            timestamps = _to_list(timestamps)
+            _check_batch(values, timestamps)
         now: float = self._time_func()
+        if len(self._window) > self._eviction_threshold:
+            self.remove_obsolete_values(now)
+        if timestamps is None:
+            items = [TimedMetricItem(now, value) for value in values]
+        else:
+            items = list(map(TimedMetricItem, timestamps, values))
+        if self._track_extremes or self._sketch is not None:
+            for item in items:
+                self._append(item)
+        elif items:
+            if not self._window:
+                self._shift = items[0].value
+            self._window.extend(items)
+            shift = self._shift
+            shifted_values = [item.value - shift for item in items]
+            self._sum += sum(item.value for item in items)
+            self._shifted_sum += sum(shifted_values)
+            self._shifted_sum_of_squares += sum(shifted * shifted for shifted in shifted_values)
+
+    def _aggregate(self) -> Union[int, float]:
+        if self._aggregation_func is summation:
+            return self._sum
+        if self._aggregation_func is average:
+            return self._average()
+        if self._aggregation_func is variance:
+            return self._variance()
+        if self._aggregation_func is minimum and self._track_extremes:
+            return self._min_value()
+        if self._aggregation_func is maximum and self._track_extremes:
+            return self._max_value()
+        return self._aggregation_func(self._window)
+
+    def _average(self) -> float:
+        return float(self._sum / len(self._window))
+
+    def _variance(self) -> float:
+        count = len(self._window)
+        shifted_mean = self._shifted_sum / count
+        # Could be slightly negative due to floating point error
+        return max(0.0, float(self._shifted_sum_of_squares / count - shifted_mean * shifted_mean))
+
+    def _min_value(self) -> Union[int, float]:
+        if not self._min_items:
+            raise ValueError("minimum of an empty window")
+        return self._min_items[0].value
+
+    def _max_value(self) -> Union[int, float]:
+        if not self._max_items:
+            raise ValueError("maximum of an empty window")
+        return self._max_items[0].value
+
+    def _append(self, item: TimedMetricItem) -> None:
+        value = item.value
+        if not self._window:
+            self._shift = value
+        self._window.append(item)
+        self._sum += value
+        shifted = value - self._shift
+        self._shifted_sum += shifted
+        self._shifted_sum_of_squares += shifted * shifted
+        if self._track_extremes:
+            while self._min_items and self._min_items[-1].value > value:
+                self._min_items.pop()
+            self._min_items.append(item)
+            while self._max_items and self._max_items[-1].value < value:
+                self._max_items.pop()
+            self._max_items.append(item)
+        if self._sketch is not None:
+            self._sketch.add(value)
+
+
+class BucketedTimedAggregator:
+    """
+    Helper class to compute aggregated metrics using fixed memory.
+
+    A drop-in replacement of :py:class:`TimedAggregator` for high event rates: instead of keeping every item, values
+    are summed into a ring of ``num_buckets`` time buckets, preallocated in arrays. Memory doesn't depend on the event
+    rate, and reading an aggregated value costs O(num_buckets).
+
+    The window consists of the current (partial) bucket and ``num_buckets - 1`` previous ones, so its actual size is
+    up to one bucket shorter than ``window_size_seconds``. Only :py:func:`summation` and :py:func:`average` could be
+    computed from buckets.
+    """
+
+    def __init__(
+        self,
+        window_size_seconds: float,
+        aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = summation,
+        time_func: Callable[[], float] = time.time,
+        num_buckets: int = 60,
+    ):
+        """
+        :param window_size_seconds: aggregation window size
+        :param aggregation_func: summation or average
+        :param time_func: a function to get current time
+        :param num_buckets: resolution of the window, e.g. 60 buckets of 1s for a 60s window
+        """
+        if aggregation_func not in (summation, average):
+            raise ValueError(f"Only summation and average are supported, got {aggregation_func}")
+        self._aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = aggregation_func
+        self._time_func: Callable[[], float] = time_func
+        self._num_buckets: int = num_buckets
+        self._bucket_size_seconds: float = window_size_seconds / num_buckets
+        self._sums: array = array("d", [0.0]) * num_buckets
+        self._counts: array = array("q", [0]) * num_buckets
+        # Sequential number of a bucket held by each slot of the ring, i.e. its start time // bucket size
+        self._bucket_numbers: array = array("q", [-1]) * num_buckets
+
+    @property
+    def aggregated_value(self) -> Union[int, float]:
+        """Return aggregated value using aggregation function."""
+        return self._aggregate()
+
+    @property
+    def average_value(self) -> float:
+        """Return average value."""
+        total, count = self._totals()
+        return float(total / count)
+
+    @property
+    def count(self) -> int:
+        """Return the number of items in the window."""
+        return self._totals()[1]
+
+    def add(self, value: Union[int, float] = 1) -> None:
+        """Append an item to a timeseries."""
+        self._add_at(self._time_func(), value)
+
+    def add_many(self, values: Iterable[Union[int, float]], timestamps: Optional[Iterable[float]] = None) -> None:
+        """
+        Append a batch of items to a timeseries.
+
+        :param values: values, e.g. a list or a NumPy array
+        :param timestamps: timestamps of values. By default, all values get the current time and go to one bucket
+        """
+        values = _to_list(values)
+        if timestamps is None:
+            if values:
+                self._add_at(self._time_func(), sum(values), len(values))
+        else:
+            timestamps = _to_list(timestamps)
+            _check_batch(values, timestamps)
+            for timestamp, value in zip(timestamps, values):
+                self._add_at(timestamp, value)
+
+    def _aggregate(self, now: Optional[float] = None) -> Union[int, float]:
+        total, count = self._totals(now)
+        if self._aggregation_func is average:
+            return float(total / count)
+        return total
+
+    def _totals(self, now: Optional[float] = None) -> Tuple[float, int]:
+        if now is None:
+            now = self._time_func()
+        current = int(now // self._bucket_size_seconds)
+        oldest = current - self._num_buckets + 1
+        total = 0.0
+        count = 0
+        for bucket_number, bucket_sum, bucket_count in zip(self._bucket_numbers, self._sums, self._counts):
+            if oldest <= bucket_number <= current:
+                total += bucket_sum
+                count += bucket_count
+        return total, count
+
+    def _add_at(self, timestamp: float, value: Union[int, float], count: int = 1) -> None:
+        """Add a value (or a sum of ``count`` values) to a bucket."""
+        self._add_to_bucket(int(timestamp // self._bucket_size_seconds), value, count)
+
+    def _add_to_bucket(self, bucket_number: int, value: Union[int, float], count: int = 1) -> None:
+        slot = bucket_number % self._num_buckets
+        held = self._bucket_numbers[slot]
+        if held != bucket_number:
+            if held > bucket_number:
+                # The slot has been reused already, the value is too old
+                return
+            # Reset the slot before claiming it, so that a concurrent reader doesn't count stale sums
+            self._sums[slot] = 0.0
+            self._counts[slot] = 0
+            self._bucket_numbers[slot] = bucket_number
+        self._sums[slot] += value
+        self._counts[slot] += count
+
+    def _bucket_totals(self, bucket_number: int) -> Tuple[float, int]:
+        """Return the sum and the count of a bucket, if the ring still holds it."""
+        slot = bucket_number % self._num_buckets
+        if self._bucket_numbers[slot] != bucket_number:
+            return 0.0, 0
+        return self._sums[slot], self._counts[slot]
+
+
+class ColumnarTimedAggregator:
+    """
+    Helper class to compute aggregated metrics, keeping the window in NumPy arrays.
+
+    Timestamps and values are stored as float64 columns of a growable buffer, 16 bytes per item. Obsolete items are
+    removed with a binary search on the timestamp column, and aggregations are vectorized.
+    :py:func:`summation`, :py:func:`average`, :py:func:`variance`, :py:func:`minimum` and :py:func:`maximum` are
+    computed with NumPy, other aggregation functions get items one by one.
+
+    Items are appended to the end of the buffer. When the end is reached, the window is moved to the start, and the
+    buffer is doubled if the window takes more than a half of it.
+    """
+
+    def __init__(
+        self,
+        window_size_seconds: float,
+        aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = summation,
+        time_func: Callable[[], float] = time.time,
+        initial_capacity: int = 1024,
+    ):
+        """
+        :param window_size_seconds: aggregation window size
+        :param aggregation_func: a function to compute an aggregated value
+        :param time_func: a function to get current time
+        :param initial_capacity: initial buffer size, items
+        """
+        if initial_capacity < 1:
+            raise ValueError(f"initial_capacity should be positive, got {initial_capacity}")
+        self._window_size_seconds: float = window_size_seconds
+        self._aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = aggregation_func
+        self._time_func: Callable[[], float] = time_func
+        # Fortran order makes each column contiguous
+        self._buffer: np.ndarray = np.empty((initial_capacity, 2), dtype=np.float64, order="F")
+        self._start: int = 0
+        self._end: int = 0
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Return timestamps of items in the window, a view valid until the next append."""
+        self.remove_obsolete_values()
+        return self._rows()[:, 0]
+
+    @property
+    def values(self) -> np.ndarray:
+        """Return values of items in the window, a view valid until the next append."""
+        self.remove_obsolete_values()
+        return self._rows()[:, 1]
+
+    @property
+    def aggregated_value(self) -> Union[int, float]:
+        """Return aggregated value using aggregation function."""
+        values = self.values
+        if self._aggregation_func is summation:
+            return float(values.sum())
+        if self._aggregation_func is average:
+            return self._average(values)
+        if self._aggregation_func is variance:
+            return self._variance(values)
+        if self._aggregation_func is minimum:
+            return float(values.min())
+        if self._aggregation_func is maximum:
+            return float(values.max())
+        return self._aggregation_func(TimedMetricItem(*row) for row in self._rows().tolist())
+
+    @property
+    def average_value(self) -> float:
+        """Return average value."""
+        return self._average(self.values)
+
+    @property
+    def variance_value(self) -> float:
+        """Return population variance of values."""
+        return self._variance(self.values)
+
+    @property
+    def std_value(self) -> float:
+        """Return population standard deviation of values."""
+        return math.sqrt(self._variance(self.values))
+
+    @property
+    def min_value(self) -> float:
+        """Return minimum value."""
+        return float(self.values.min())
+
+    @property
+    def max_value(self) -> float:
+        """Return maximum value."""
+        return float(self.values.max())
+
+    @property
+    def count(self) -> int:
+        """Return the number of items in the window."""
+        self.remove_obsolete_values()
+        return self._end - self._start
+
+    @staticmethod
+    def _average(values: np.ndarray) -> float:
+        if not len(values):
+            raise ZeroDivisionError("average of an empty window")
+        return float(values.mean())
+
+    @staticmethod
+    def _variance(values: np.ndarray) -> float:
+        if not len(values):
+            raise ZeroDivisionError("variance of an empty window")
+        return float(values.var())
+
+    def to_frame(self) -> "pd.DataFrame":
+        """
+        Return the window as a DataFrame with ``timestamp`` and ``value`` columns, without copying.
+
+        The frame shares memory with the buffer, copy it if it's needed after the next append.
+        """
+        import pandas as pd
+
+        self.remove_obsolete_values()
+        return pd.DataFrame(self._rows(), columns=["timestamp", "value"], copy=False)
+
+    def quantile(self, fraction: float) -> float:
+        """Return a quantile of values (lower nearest rank), same as :py:func:`quantile`."""
+        values = self.values
+        if not len(values):
+            raise ValueError("quantile of an empty window")
+        rank = int(fraction * (len(values) - 1))
+        return float(np.partition(values, rank)[rank])
+
+    def remove_obsolete_values(self, now: Optional[float] = None) -> None:
+        """
+        Remove values which are outside of time window.
+
+        :param now: current time, if it's already known
+        """
+        if now is None:
+            now = self._time_func()
         threshold = now - self._window_size_seconds
-        while len(self._window) > 0 and self._window[0].timestamp < threshold:
-            self._window.popleft()
+        timestamps = self._rows()[:, 0]
+        self._start += int(np.searchsorted(timestamps, threshold, side="left"))
 
     def add(self, value: Union[int, float] = 1) -> None:
         """Append an item to a timeseries."""
         now: float = self._time_func()
+        self.remove_obsolete_values(now)
+        self._reserve(1)
+        self._buffer[self._end] = (now, value)
+        self._end += 1
+
+    def add_many(self, values: Iterable[Union[int, float]], timestamps: Optional[Iterable[float]] = None) -> None:
+        """
+        Append a batch of items to a timeseries, reading the clock and removing obsolete values only once.
+
+        :param values: values, e.g. a list or a NumPy array
+        :param timestamps: timestamps of values, in non-decreasing order and not older than already added items. By
+            default, all values get the current time
+        """
+        values = _to_array(values)
+        if timestamps is not None:
+            timestamps = _to_array(timestamps)
+            _check_batch(values, timestamps)
+        now: float = self._time_func()
+        self.remove_obsolete_values(now)
+        self._reserve(len(values))
+        batch = self._buffer[slice(self._end, self._end + len(values))]
+        batch[:, 0] = now if timestamps is None else timestamps
+        batch[:, 1] = values
+        self._end += len(values)
+
+    def _rows(self) -> np.ndarray:
+        return self._buffer[slice(self._start, self._end)]
+
+    def _reserve(self, size: int) -> None:
+        """Make room for appending ``size`` items."""
+        if self._end + size <= len(self._buffer):
+            return
+        window_size = self._end - self._start
+        capacity = len(self._buffer)
+        while window_size + size > capacity // 2:
+            capacity *= 2
+        if capacity == len(self._buffer):
+            buffer = self._buffer
+        else:
+            buffer = np.empty((capacity, 2), dtype=np.float64, order="F")
+        buffer[:window_size] = self._rows()
+        self._buffer = buffer
+        self._start, self._end = 0, window_size
+
+
+class ThreadSafeTimedAggregator(TimedAggregator):
+    """
+    A :py:class:`TimedAggregator` which could be shared between threads.
+
+    Every operation holds a lock, which is only contended for the duration of a deque append or an O(1) read, unless
+    a custom aggregation function scans the window.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock: threading.RLock = threading.RLock()
+
+    @property
+    def aggregated_value(self) -> Union[int, float]:
+        """Return aggregated value using aggregation function."""
+        with self._lock:
+            return super().aggregated_value
+
+    @property
+    def average_value(self) -> float:
+        """Return average value."""
+        with self._lock:
+            return super().average_value
+
+    @property
+    def variance_value(self) -> float:
+        """Return population variance of values."""
+        with self._lock:
+            return super().variance_value
+
+    @property
+    def min_value(self) -> Union[int, float]:
+        """Return minimum value."""
+        with self._lock:
+            return super().min_value
+
+    @property
+    def max_value(self) -> Union[int, float]:
+        """Return maximum value."""
+        with self._lock:
+            return super().max_value
+
+    @property
+    def count(self) -> int:
+        """Return the number of items in the window."""
+        with self._lock:
+            return super().count
+
+    def quantile(self, fraction: float) -> Union[int, float]:
+        """Return a quantile of values, approximate if quantile_accuracy is set."""
+        with self._lock:
+            return super().quantile(fraction)
+
+    def remove_obsolete_values(self, now: Optional[float] = None) -> None:
+        """
+        Remove values which are outside of time window.
+
+        :param now: current time, if it's already known
+        """
+        with self._lock:
+            super().remove_obsolete_values(now)
+
+    def add(self, value: Union[int, float] = 1) -> None:
+        """Append an item to a timeseries."""
+        with self._lock:
+            super().add(value)
+
+    def add_many(self, values: Iterable[Union[int, float]], timestamps: Optional[Iterable[float]] = None) -> None:
+        """
+        Append a batch of items to a timeseries, reading the clock and removing obsolete values only once.
+
+        :param values: values, e.g. a list or a NumPy array
+        :param timestamps: timestamps of values, in non-decreasing order and not older than already added items. By
+            default, all values get the current time
+        """
+        with self._lock:
+            super().add_many(values, timestamps)
+
+
+class SharedBucketedTimedAggregator(BucketedTimedAggregator):
+    """
+    A :py:class:`BucketedTimedAggregator` which keeps its buckets in shared memory.
+
+    Several processes could add values and any process could read the aggregated value, without IPC round trips or
+    locks. Each writer owns a separate row of buckets, which is written only by that writer, while readers sum all
+    rows. The segment is created by the first instance and attached to by name in other processes:
+
+    .. code-block:: python
+
+        metric = SharedBucketedTimedAggregator(60, num_writers=4)
+
+        # In a worker process, given metric.name and a unique writer_index
+        worker_metric = SharedBucketedTimedAggregator(60, num_writers=4, name=name, writer_index=writer_index)
+        worker_metric.add(1)
+
+        metric.aggregated_value  # a sum of values added by all workers
+        metric.close()
+        metric.unlink()
+
+    A single writer row must not be written concurrently, e.g. by several threads of a process.
+    """
+
+    def __init__(
+        self,
+        window_size_seconds: float,
+        aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = summation,
+        time_func: Callable[[], float] = time.time,
+        num_buckets: int = 60,
+        num_writers: int = 1,
+        writer_index: int = 0,
+        name: Optional[str] = None,
+    ):
+        """
+        :param window_size_seconds: aggregation window size
+        :param aggregation_func: summation or average
+        :param time_func: a function to get current time, must be the same for all processes
+        :param num_buckets: resolution of the window, e.g. 60 buckets of 1s for a 60s window
+        :param num_writers: number of writer rows, must be the same for all processes
+        :param writer_index: row to write values to, from 0 to num_writers - 1
+        :param name: name of an existing shared memory segment to attach to. By default, a new one is created
+        """
+        super().__init__(window_size_seconds, aggregation_func, time_func, num_buckets)
+        if not 0 <= writer_index < num_writers:
+            raise ValueError(f"writer_index should be in [0, {num_writers}), got {writer_index}")
+        # Sums, counts and bucket numbers of each writer, all as doubles, which represent integers up to 2**53 exactly
+        size = num_writers * 3 * num_buckets * 8
+        if name is None:
+            self._shm: shared_memory.SharedMemory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self._rows: np.ndarray = np.ndarray((num_writers, 3, num_buckets), dtype=np.float64, buffer=self._shm.buf)
+        if name is None:
+            self._rows[:, 2] = -1
+        # Scalar access to a memoryview is much faster than to a NumPy array
+        doubles = self._shm.buf.cast("d")
+        row_start = writer_index * 3 * num_buckets
+        self._sums = doubles[slice(row_start, row_start + num_buckets)]  # type: ignore
+        self._counts = doubles[slice(row_start + num_buckets, row_start + 2 * num_buckets)]  # type: ignore
+        self._bucket_numbers = doubles[slice(row_start + 2 * num_buckets, row_start + 3 * num_buckets)]  # type: ignore
+
+    @property
+    def name(self) -> str:
+        """Return the name of the shared memory segment, to attach to it from other processes."""
+        return self._shm.name
+
+    def close(self) -> None:
+        """Detach from the shared memory segment, the instance can't be used afterwards."""
+        del self._sums, self._counts, self._bucket_numbers, self._rows
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Destroy the shared memory segment, should be called once, by the process which created it."""
+        self._shm.unlink()
+
+    def _totals(self, now: Optional[float] = None) -> Tuple[float, int]:
+        if now is None:
+            now = self._time_func()
+        current = int(now // self._bucket_size_seconds)
+        oldest = current - self._num_buckets + 1
+        bucket_numbers = self._rows[:, 2]
+        mask = (oldest <= bucket_numbers) & (bucket_numbers <= current)
+        return float(self._rows[:, 0][mask].sum()), int(self._rows[:, 1][mask].sum())
+
+
+class TimedAggregatorRegistry:
+    """
+    A collection of :py:class:`TimedAggregator` series keyed by labels, e.g. ``(exchange, symbol, event_type)``.
+
+    Adding a value doesn't remove obsolete values, they are removed on read: for all series at once, with a single
+    clock read, by :py:meth:`snapshot` and :py:meth:`remove_obsolete_values`. Write-heavy registries which are rarely
+    read should call :py:meth:`remove_obsolete_values` periodically. Series with no values left in the window are
+    dropped, and if ``max_series`` is set, the least recently updated series are dropped to keep cardinality bounded:
+
+    .. code-block:: python
+
+        trades = TimedAggregatorRegistry(60, label_names=("exchange", "symbol"), max_series=10_000)
+        trades.add(("binance", "BTC-USDT"), 0.5)
+        trades.snapshot(as_frame=True)
+    """
+
+    def __init__(
+        self,
+        window_size_seconds: float,
+        aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = summation,
+        time_func: Callable[[], float] = time.time,
+        max_series: Optional[int] = None,
+        label_names: Optional[Sequence[str]] = None,
+    ):
+        """
+        :param window_size_seconds: aggregation window size
+        :param aggregation_func: a function to compute an aggregated value
+        :param time_func: a function to get current time
+        :param max_series: maximum number of series, the least recently updated ones are dropped above it
+        :param label_names: names of labels, used as index names of :py:meth:`snapshot` DataFrame
+        """
+        self._window_size_seconds: float = window_size_seconds
+        self._aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = aggregation_func
+        self._time_func: Callable[[], float] = time_func
+        self._max_series: Optional[int] = max_series
+        self._label_names: Optional[Sequence[str]] = label_names
+        # Ordered from the least to the most recently updated
+        self._series: "OrderedDict[Hashable, TimedAggregator]" = OrderedDict()
+
+    def add(self, labels: Hashable, value: Union[int, float] = 1) -> None:
+        """
+        Append an item to a timeseries of given labels, creating it if needed.
+
+        :param labels: labels of a series, e.g. a tuple
+        :param value: value to add
+        """
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = self._create_series()
+            if self._max_series is not None and len(self._series) > self._max_series:
+                self._series.popitem(last=False)
+        elif self._max_series is not None:
+            self._series.move_to_end(labels)
+        series._append(TimedMetricItem(self._time_func(), value))
+
+    def aggregated_value(self, labels: Hashable) -> Union[int, float]:
+        """
+        Return aggregated value of a series.
+
+        A series which doesn't exist, e.g. it was dropped because it had no values left in the window, has the
+        aggregated value of an empty window: 0 for :py:func:`summation`, while :py:func:`average` raises
+        ZeroDivisionError. So the result doesn't depend on whether obsolete values were already removed.
+        """
+        series = self._series.get(labels)
+        if series is None:
+            series = self._create_series()
+        return series.aggregated_value
+
+    def remove_obsolete_values(self, now: Optional[float] = None) -> None:
+        """
+        Remove values which are outside of time window from all series, and drop empty series.
+
+        :param now: current time, if it's already known
+        """
+        if now is None:
+            now = self._time_func()
+        empty = []
+        for labels, series in self._series.items():
+            series.remove_obsolete_values(now)
+            if not series._window:
+                empty.append(labels)
+        for labels in empty:
+            del self._series[labels]
+
+    def snapshot(self, as_frame: bool = False) -> Union[Dict[Hashable, Union[int, float]], "pd.DataFrame"]:
+        """
+        Return aggregated values of all series.
+
+        :param as_frame: return a DataFrame with a ``value`` column, indexed by labels, instead of a dict
+        """
         self.remove_obsolete_values()
-        self._window.append(TimedMetricItem(now, value))
+        values = {labels: series._aggregate() for labels, series in self._series.items()}
+        if not as_frame:
+            return values
+        import pandas as pd
+
+        names = self._label_names
+        if (names is not None and len(names) > 1) or (values and all(isinstance(labels, tuple) for labels in values)):
+            index = pd.MultiIndex.from_tuples(list(values), names=names)
+        else:
+            index = pd.Index(list(values), name=names[0] if names else None)
+        return pd.DataFrame({"value": list(values.values())}, index=index)
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def __contains__(self, labels: Hashable) -> bool:
+        return labels in self._series
+
+    def _create_series(self) -> TimedAggregator:
+        return TimedAggregator(self._window_size_seconds, self._aggregation_func, self._time_func)
+
+
+class DecayingAggregator:
+    """
+    Helper class to compute exponentially decayed metrics in O(1) memory.
+
+    A lightweight alternative to :py:class:`TimedAggregator` for smoothed metrics, e.g. events per second. Instead of
+    keeping a window, a sum and a count of values are kept, which decay exponentially with time constant
+    ``window_size_seconds``. For a steady stream of values, the decayed sum converges to the sum over a window of that
+    size, so readings have the same scale as :py:class:`TimedAggregator` ones and both could be swapped.
+
+    Only :py:func:`summation` and :py:func:`average` are supported.
+    """
+
+    def __init__(
+        self,
+        window_size_seconds: float,
+        aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = summation,
+        time_func: Callable[[], float] = time.time,
+    ):
+        """
+        :param window_size_seconds: time constant of decay
+        :param aggregation_func: summation or average
+        :param time_func: a function to get current time
+        """
+        if aggregation_func not in (summation, average):
+            raise ValueError(f"Only summation and average are supported, got {aggregation_func}")
+        self._window_size_seconds: float = window_size_seconds
+        self._aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = aggregation_func
+        self._time_func: Callable[[], float] = time_func
+        self._sum: float = 0.0
+        self._count: float = 0.0
+        self._last_timestamp: Optional[float] = None
+
+    @property
+    def aggregated_value(self) -> float:
+        """Return decayed sum or average, depending on aggregation function."""
+        self._decay(self._time_func())
+        if self._aggregation_func is average:
+            return self._sum / self._count
+        return self._sum
+
+    @property
+    def average_value(self) -> float:
+        """Return decayed average value."""
+        self._decay(self._time_func())
+        return self._sum / self._count
+
+    @property
+    def count(self) -> float:
+        """Return decayed number of items."""
+        self._decay(self._time_func())
+        return self._count
+
+    @property
+    def rate(self) -> float:
+        """Return decayed sum of values per second, e.g. events per second if every value is 1."""
+        self._decay(self._time_func())
+        return self._sum / self._window_size_seconds
+
+    def add(self, value: Union[int, float] = 1) -> None:
+        """Append an item to a timeseries."""
+        self._add_at(self._time_func(), value)
+
+    def add_many(self, values: Iterable[Union[int, float]], timestamps: Optional[Iterable[float]] = None) -> None:
+        """
+        Append a batch of items to a timeseries.
+
+        :param values: values, e.g. a list or a NumPy array
+        :param timestamps: timestamps of values. By default, all values get the current time
+        """
+        values = _to_list(values)
+        if timestamps is None:
+            if values:
+                self._add_at(self._time_func(), sum(values), len(values))
+        else:
+            timestamps = _to_list(timestamps)
+            _check_batch(values, timestamps)
+            for timestamp, value in zip(timestamps, values):
+                self._add_at(timestamp, value)
+
+    def _decay(self, now: float) -> None:
+        if self._last_timestamp is None or now <= self._last_timestamp:
+            return
+        factor = math.exp((self._last_timestamp - now) / self._window_size_seconds)
+        self._sum *= factor
+        self._count *= factor
+        self._last_timestamp = now
+
+    def _add_at(self, timestamp: float, value: Union[int, float], count: int = 1) -> None:
+        """Add a value (or a sum of ``count`` values)."""
+        if self._last_timestamp is None:
+            self._last_timestamp = timestamp
+        self._decay(timestamp)
+        if timestamp < self._last_timestamp:
+            # An item from the past is added with the weight it would have by now
+            weight = math.exp((timestamp - self._last_timestamp) / self._window_size_seconds)
+            self._sum += value * weight
+            self._count += count * weight
+        else:
+            self._sum += value
+            self._count += count
+
+
+class MultiWindowAggregator:
+    """
+    Helper class to compute aggregated metrics over several windows of one timeseries.
+
+    Replaces a set of :py:class:`TimedAggregator` instances fed with the same values, e.g. for 1s, 10s, 60s and 300s
+    windows. Each window is a ring of ``num_buckets`` buckets, like in :py:class:`BucketedTimedAggregator`, so memory
+    is proportional to the number of windows and buckets, regardless of the event rate:
+
+    .. code-block:: python
+
+        trades = MultiWindowAggregator([1, 10, 60, 300])
+        trades.add(0.5)
+        trades.aggregated_value(window=60)
+
+    Adding a value reads the clock once and updates one bucket of the smallest window. Larger windows are rolled up
+    from it: when a value for a later bucket arrives, the total of the previous bucket is added to the buckets of larger
+    windows, so the cost of an add doesn't grow with the number of windows. A bucket of the smallest window goes to the
+    bucket of a larger window which holds its middle, so larger windows are exact if their bucket size is a multiple of
+    the smallest bucket size, as in the example above.
+    """
+
+    def __init__(
+        self,
+        window_sizes_seconds: Iterable[float],
+        aggregation_func: Callable[[Iterable[TimedMetricItem]], Union[int, float]] = summation,
+        time_func: Callable[[], float] = time.time,
+        num_buckets: int = 60,
+    ):
+        """
+        :param window_sizes_seconds: aggregation window sizes
+        :param aggregation_func: summation or average
+        :param time_func: a function to get current time
+        :param num_buckets: resolution of every window
+        """
+        self._time_func: Callable[[], float] = time_func
+        self._aggregation_func = aggregation_func
+        self._windows: Dict[float, BucketedTimedAggregator] = {
+            window_size: BucketedTimedAggregator(window_size, aggregation_func, time_func, num_buckets)
+            for window_size in sorted(window_sizes_seconds)
+        }
+        if not self._windows:
+            raise ValueError("At least one window size is required")
+        finest, *coarse = self._windows.values()
+        self._finest: BucketedTimedAggregator = finest
+        self._coarse: List[BucketedTimedAggregator] = coarse
+        # The bucket of the smallest window which is being filled, it isn't rolled up into larger windows yet
+        self._open_bucket: int = -1
+        self._largest_window: float = max(self._windows)
+
+    @property
+    def window_sizes(self) -> Tuple[float, ...]:
+        """Return window sizes, in ascending order."""
+        return tuple(self._windows)
+
+    def aggregated_value(self, window: Optional[float] = None) -> Union[int, float]:
+        """
+        Return aggregated value of a window using aggregation function.
+
+        :param window: window size, the largest one by default
+        """
+        return self._aggregate(self._window(window), self._time_func())
+
+    def average_value(self, window: Optional[float] = None) -> float:
+        """
+        Return average value of a window.
+
+        :param window: window size, the largest one by default
+        """
+        total, count = self._totals(self._window(window), self._time_func())
+        return float(total / count)
+
+    def count(self, window: Optional[float] = None) -> int:
+        """
+        Return the number of items in a window.
+
+        :param window: window size, the largest one by default
+        """
+        _, count = self._totals(self._window(window), self._time_func())
+        return count
+
+    def snapshot(self) -> Dict[float, Union[int, float]]:
+        """Return aggregated values of all windows, reading the clock once."""
+        now = self._time_func()
+        return {window_size: self._aggregate(aggregator, now) for window_size, aggregator in self._windows.items()}
+
+    def add(self, value: Union[int, float] = 1) -> None:
+        """Append an item to a timeseries."""
+        self._add_at(self._time_func(), value)
+
+    def add_many(self, values: Iterable[Union[int, float]], timestamps: Optional[Iterable[float]] = None) -> None:
+        """
+        Append a batch of items to a timeseries.
+
+        :param values: values, e.g. a list or a NumPy array
+        :param timestamps: timestamps of values. By default, all values get the current time and go to one bucket
+        """
+        values = _to_list(values)
+        if timestamps is None:
+            if values:
+                self._add_at(self._time_func(), sum(values), len(values))
+        else:
+            timestamps = _to_list(timestamps)
+            _check_batch(values, timestamps)
+            for timestamp, value in zip(timestamps, values):
+                self._add_at(timestamp, value)
+
+    def _window(self, window: Optional[float]) -> BucketedTimedAggregator:
+        if window is None:
+            window = self._largest_window
+        try:
+            return self._windows[window]
+        except KeyError:
+            raise ValueError(f"Unknown window {window}, expected one of {self.window_sizes}") from None
+
+    def _aggregate(self, aggregator: BucketedTimedAggregator, now: float) -> Union[int, float]:
+        total, count = self._totals(aggregator, now)
+        if self._aggregation_func is average:
+            return float(total / count)
+        return total
+
+    def _totals(self, aggregator: BucketedTimedAggregator, now: float) -> Tuple[float, int]:
+        total, count = aggregator._totals(now)
+        if aggregator is not self._finest:
+            # The open bucket of the smallest window isn't rolled up yet
+            bucket_size = aggregator._bucket_size_seconds
+            current = int(now // bucket_size)
+            open_bucket = int(self._bucket_middle(self._open_bucket) // bucket_size)
+            if current - aggregator._num_buckets < open_bucket <= current:
+                open_total, open_count = self._finest._bucket_totals(self._open_bucket)
+                total += open_total
+                count += open_count
+        return total, count
+
+    def _add_at(self, timestamp: float, value: Union[int, float], count: int = 1) -> None:
+        """Add a value (or a sum of ``count`` values) to the smallest window."""
+        bucket_number = int(timestamp // self._finest._bucket_size_seconds)
+        if bucket_number > self._open_bucket:
+            open_total, open_count = self._finest._bucket_totals(self._open_bucket)
+            if open_count:
+                self._roll_up(self._open_bucket, open_total, open_count)
+            self._open_bucket = bucket_number
+        elif bucket_number < self._open_bucket:
+            # The bucket has been rolled up already, so a late value goes to larger windows directly
+            self._roll_up(bucket_number, value, count)
+        self._finest._add_to_bucket(bucket_number, value, count)
+
+    def _roll_up(self, bucket_number: int, value: Union[int, float], count: int) -> None:
+        """Add a value (or a sum of ``count`` values) from a bucket of the smallest window to larger windows."""
+        middle = self._bucket_middle(bucket_number)
+        for aggregator in self._coarse:
+            aggregator._add_at(middle, value, count)
+
+    def _bucket_middle(self, bucket_number: int) -> float:
+        return (bucket_number + 0.5) * self._finest._bucket_size_seconds
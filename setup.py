@@ -47,6 +47,7 @@ setup(
         'cachetools==4.*,>=4.0.0',
         'environs==9.*,>=9.0.0',
         'kafka-python==2.*,>=2.0.0',
+        'numpy>=1.15.4',
         'pandas==1.*,>=1.1.0',
         'pydantic==1.*,>=1.9.0',
         'python-json-logger==2.*,>=2.0.0',
@@ -1,7 +1,10 @@
 import asyncio
+import os
 import random
+import subprocess
 import sys
-from unittest.mock import MagicMock, patch
+import time
+from unittest.mock import ANY, MagicMock, patch
 
 import pytest
 from async_timeout import timeout
@@ -36,6 +39,271 @@ async def test_async_ttl_cache():
     assert result2 == result
 
 
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_coalesces_concurrent_misses():
+    calls = 0
+
+    @async_utils.async_ttl_cache(30, 10)
+    async def func(x):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    results = await asyncio.gather(*[func(21) for _ in range(100)], func(1))
+    assert results == [42] * 100 + [2]
+    assert calls == 2
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_exception_not_cached():
+    calls = 0
+
+    @async_utils.async_ttl_cache(30, 10)
+    async def func():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        if calls == 1:
+            raise RuntimeError("boom")
+        return calls
+
+    results = await asyncio.gather(func(), func(), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert calls == 1
+
+    assert await func() == 2
+    assert await func() == 2
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_cancelled_waiter():
+    @async_utils.async_ttl_cache(30, 10)
+    async def func():
+        await asyncio.sleep(0.01)
+        return 42
+
+    first = asyncio.ensure_future(func())
+    second = asyncio.ensure_future(func())
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == 42
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_key_same_repr():
+    class Symbol:
+        def __init__(self, name):
+            self.name = name
+
+        def __repr__(self):
+            return "Symbol"
+
+    @async_utils.async_ttl_cache(30, 10)
+    async def func(symbol):
+        return symbol.name
+
+    assert await func(Symbol("BTC")) == "BTC"
+    assert await func(Symbol("ETH")) == "ETH"
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_typed():
+    @async_utils.async_ttl_cache(30, 10)
+    async def untyped(x):
+        return type(x)
+
+    @async_utils.async_ttl_cache(30, 10, typed=True)
+    async def typed(x):
+        return type(x)
+
+    assert await untyped(1) is int
+    assert await untyped(1.0) is int
+    assert await typed(1) is int
+    assert await typed(1.0) is float
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_custom_key():
+    @async_utils.async_ttl_cache(30, 10, key=lambda symbol, **kwargs: symbol)
+    async def func(symbol, request_id):
+        return request_id
+
+    assert await func("BTC", request_id=1) == 1
+    assert await func("BTC", request_id=2) == 1
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_unhashable_args():
+    calls = 0
+
+    @async_utils.async_ttl_cache(30, 10)
+    async def func(values):
+        return sum(values)
+
+    with pytest.raises(TypeError, match="pass key= to async_ttl_cache"):
+        await func([1, 2])
+
+    @async_utils.async_ttl_cache(30, 10, key=async_utils.repr_key)
+    async def func_with_repr_key(values):
+        nonlocal calls
+        calls += 1
+        return sum(values)
+
+    assert await func_with_repr_key([1, 2]) == 3
+    assert await func_with_repr_key([1, 2]) == 3
+    assert calls == 1
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_info():
+    @async_utils.async_ttl_cache(30, 2)
+    async def func(x):
+        return x
+
+    for arg in [1, 1, 2, 3, 3]:
+        await func(arg)
+
+    assert func.cache_info() == async_utils.CacheInfo(hits=2, misses=3, evictions=1, currsize=2, maxsize=2)
+
+    func.cache_clear()
+    assert func.cache_info() == async_utils.CacheInfo(hits=0, misses=0, evictions=0, currsize=0, maxsize=2)
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_invalidate():
+    calls = 0
+
+    @async_utils.async_ttl_cache(30, 10)
+    async def func(x, y=0):
+        nonlocal calls
+        calls += 1
+        return x + y
+
+    await func(1, y=2)
+    func.invalidate(1)
+    await func(1, y=2)
+    assert calls == 1
+
+    func.invalidate(1, y=2)
+    await func(1, y=2)
+    assert calls == 2
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_per_instance():
+    class Client:
+        def __init__(self, name):
+            self.name = name
+            self.calls = 0
+
+        @async_utils.async_ttl_cache(30, 1, per_instance=True)
+        async def fetch(self, symbol):
+            self.calls += 1
+            return f"{self.name}:{symbol}"
+
+    first, second = Client("first"), Client("second")
+    for _ in range(3):
+        assert await first.fetch("BTC") == "first:BTC"
+        assert await second.fetch("BTC") == "second:BTC"
+    assert first.calls == second.calls == 1
+    assert Client.fetch.cache_info().currsize == 2
+
+    Client.fetch.invalidate(first, "BTC")
+    await first.fetch("BTC")
+    assert first.calls == 2
+
+    del second
+    assert Client.fetch.cache_info().currsize == 1
+
+    # A finalizer is registered once per instance, even if the cache is cleared
+    with patch.object(async_utils.weakref, "finalize") as finalize:
+        Client.fetch.cache_clear()
+        assert Client.fetch.cache_info().currsize == 0
+        assert await first.fetch("BTC") == "first:BTC"
+        third = Client("third")
+        assert await third.fetch("BTC") == "third:BTC"
+    finalize.assert_called_once_with(third, ANY, ANY, None)
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_per_instance_slots():
+    class SlotsClient:
+        __slots__ = ("calls",)
+
+        @async_utils.async_ttl_cache(30, 1, per_instance=True)
+        async def fetch(self, symbol):
+            return symbol
+
+    with pytest.raises(TypeError, match="add '__weakref__' to its __slots__"):
+        await SlotsClient().fetch("BTC")
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_stale_while_revalidate():
+    calls = 0
+
+    @async_utils.async_ttl_cache(ttl=0.05, maxsize=10, stale_ttl=10)
+    async def func():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    assert await func() == 1
+    await asyncio.sleep(0.06)
+
+    # Stale result is returned immediately, only one refresh is started
+    assert await asyncio.gather(func(), func()) == [1, 1]
+    await asyncio.sleep(0.02)
+    assert calls == 2
+    assert await func() == 2
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_refresh_failure(caplog):
+    calls = 0
+
+    @async_utils.async_ttl_cache(ttl=0.05, maxsize=10, stale_ttl=10)
+    async def func():
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            raise RuntimeError("boom")
+        return calls
+
+    assert await func() == 1
+    await asyncio.sleep(0.06)
+    assert await func() == 1
+    await asyncio.sleep(0.01)
+    assert calls == 2
+    assert "Failed to refresh cached result" in caplog.text
+    assert await func() == 1
+
+
+@pytest.mark.asyncio()
+async def test_async_ttl_cache_refresh_ahead():
+    calls = 0
+
+    @async_utils.async_ttl_cache(ttl=10, maxsize=10, refresh_ahead=10)
+    async def func():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await func() == 1
+    assert await func() == 1
+    await asyncio.sleep(0.01)
+    assert await func() == 2
+
+
+def test_async_ttl_cache_refresh_ahead_validation():
+    with pytest.raises(ValueError, match="refresh_ahead"):
+        async_utils.async_ttl_cache(ttl=10, refresh_ahead=20)
+
+
 def test_get_callers():
     callers = async_utils.get_callers()
     assert isinstance(callers, list)
@@ -59,6 +327,39 @@ async def test_safe_ensure_future_2(caplog):
     )
 
 
+def test_inspect_callers_mode_validation():
+    assert async_utils._parse_inspect_callers_mode("frame") is async_utils.InspectCallersMode.FRAME
+    with pytest.raises(ValueError, match="should be one of inspect, frame, got 'frames'"):
+        async_utils._parse_inspect_callers_mode("frames")
+
+    env = {**os.environ, "INSPECT_CALLERS_MODE": "frames"}
+    result = subprocess.run(
+        [sys.executable, "-c", "import birdfeeder.async_utils"], env=env, capture_output=True, text=True
+    )
+    assert result.returncode != 0
+    assert "INSPECT_CALLERS_MODE should be one of" in result.stderr
+
+
+@pytest.mark.asyncio()
+async def test_safe_ensure_future_inspect_frame_mode(caplog):
+    with patch.object(async_utils, "SHOULD_INSPECT", True), patch.object(
+        async_utils, "INSPECT_CALLERS_MODE", async_utils.InspectCallersMode.FRAME
+    ):
+        await async_utils.safe_ensure_future(bad_coroutine())
+    assert (
+        "Unhandled error in background task: boom \n(1, \'birdfeeder.async_utils\', \'safe_ensure_future\')"
+        in caplog.text
+    )
+
+
+def test_lazy_callers_same_as_get_callers():
+    def capture():
+        return async_utils.get_callers(), async_utils.LazyCallers(sys._getframe(0))
+
+    callers, lazy_callers = capture()
+    assert str(lazy_callers) == "\n" + "\n".join(str(t) for t in callers)
+
+
 @pytest.mark.asyncio()
 async def test_safe_ensure_future_named_1():
     safe_wrapped = async_utils.safe_ensure_future(ok_coroutine())
@@ -85,9 +386,142 @@ async def test_safe_gather_2():
         await async_utils.safe_gather(bad_coroutine())
 
 
-def test_calc_delay_til_next_tick():
-    import time
+async def consume(iterator):
+    async for _ in iterator:
+        pass
+
+
+class ConcurrencyCounter:
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+
+    async def double(self, x):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(random.random() / 1000)  # noqa: DUO102
+        finally:
+            self.running -= 1
+        if x < 0:
+            raise RuntimeError("boom")
+        return x * 2
+
+
+@pytest.mark.asyncio()
+async def test_safe_gather_limit():
+    counter = ConcurrencyCounter()
+    results = await async_utils.safe_gather(*[counter.double(i) for i in range(50)], limit=5)
+    assert results == [i * 2 for i in range(50)]
+    assert counter.max_running == 5
+
 
+@pytest.mark.asyncio()
+async def test_safe_gather_limit_exception():
+    counter = ConcurrencyCounter()
+    with pytest.raises(RuntimeError, match="boom"):
+        await async_utils.safe_gather(counter.double(1), counter.double(-1), counter.double(2), limit=1)
+
+    results = await async_utils.safe_gather(counter.double(1), counter.double(-1), limit=1, return_exceptions=True)
+    assert results[0] == 2
+    assert isinstance(results[1], RuntimeError)
+
+
+@pytest.mark.asyncio()
+async def test_safe_map():
+    counter = ConcurrencyCounter()
+    results = await async_utils.safe_map(counter.double, range(100), limit=10)
+    assert results == [i * 2 for i in range(100)]
+    assert counter.max_running == 10
+
+    with pytest.raises(ValueError, match="limit should be positive"):
+        await async_utils.safe_map(counter.double, range(10), limit=0)
+
+
+@pytest.mark.asyncio()
+async def test_safe_as_completed():
+    counter = ConcurrencyCounter()
+    results = [r async for r in async_utils.safe_as_completed((counter.double(i) for i in range(100)), limit=10)]
+    assert sorted(results) == [i * 2 for i in range(100)]
+    assert counter.max_running == 10
+
+    results = [r async for r in async_utils.safe_as_completed([counter.double(1), counter.double(2)])]
+    assert sorted(results) == [2, 4]
+
+
+@pytest.mark.asyncio()
+async def test_safe_as_completed_exception():
+    counter = ConcurrencyCounter()
+    aws = (counter.double(i) for i in [1, -1] + list(range(100)))
+    with pytest.raises(RuntimeError, match="boom"):
+        await consume(async_utils.safe_as_completed(aws, limit=2))
+    await asyncio.sleep(0)
+    assert counter.running == 0
+
+
+@pytest.mark.asyncio()
+async def test_supervisor_restarts_failed_task():
+    calls = 0
+    finished = asyncio.Event()
+
+    async def flaky():
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise RuntimeError("boom")
+        finished.set()
+
+    async with async_utils.Supervisor(backoff_base=0.001) as supervisor:
+        supervisor.start("flaky", flaky)
+        async with timeout(5):
+            await finished.wait()
+        await asyncio.sleep(0.01)
+        stats = supervisor.stats()["flaky"]
+        assert stats.restarts == 2
+        assert not stats.running
+
+
+@pytest.mark.asyncio()
+async def test_supervisor_restart_budget(caplog):
+    async def failing():
+        raise RuntimeError("boom")
+
+    async with async_utils.Supervisor(max_restarts=3, backoff_base=0.001) as supervisor:
+        supervisor.start("failing", failing, policy=async_utils.RestartPolicy.ALWAYS)
+        async with timeout(5):
+            while supervisor.stats()["failing"].running:
+                await asyncio.sleep(0.01)
+        assert supervisor.stats()["failing"].restarts == 3
+    assert "restarted 3 times within 60s, giving up" in caplog.text
+
+
+@pytest.mark.asyncio()
+async def test_supervisor_stop():
+    async def forever():
+        await asyncio.sleep(300)
+
+    supervisor = async_utils.Supervisor()
+    supervisor.start("first", forever)
+    supervisor.start("second", forever)
+    with pytest.raises(ValueError, match="already running"):
+        supervisor.start("first", forever)
+    await asyncio.sleep(0.01)
+
+    stats = supervisor.stats()
+    assert stats["first"].running
+    assert stats["first"].uptime > 0
+
+    async with timeout(5):
+        await supervisor.stop()
+    assert not any(s.running for s in supervisor.stats().values())
+
+
+def test_supervisor_backoff_delay():
+    supervisor = async_utils.Supervisor(backoff_base=1, backoff_max=10, jitter=0)
+    assert [supervisor._backoff_delay(i) for i in range(5)] == [1, 2, 4, 8, 10]
+
+
+def test_calc_delay_til_next_tick():
     with patch.object(time, "time", return_value=0.1):
         delay = async_utils.calc_delay_til_next_tick(5)
         assert delay == 5 - 0.1
@@ -101,6 +535,111 @@ async def test_wait_til_next_tick():
         sleep.assert_called_once()
 
 
+@pytest.mark.asyncio()
+async def test_tick_dispatcher():
+    loop = asyncio.get_running_loop()
+    dispatcher = async_utils.TickDispatcher()
+    with patch.object(time, "time", return_value=100.005), patch.object(loop, "call_later") as call_later:
+        waiters = [asyncio.ensure_future(dispatcher.wait_til_next_tick(0.02)) for _ in range(100)]
+        other_waiter = asyncio.ensure_future(dispatcher.wait_til_next_tick(0.03))
+        await asyncio.sleep(0)
+    # A single timer per tick, which fires at the end of the quantized interval
+    assert dispatcher.scheduled_ticks == 2
+    assert [c.args[0] for c in call_later.call_args_list] == pytest.approx([0.015, 0.015])
+
+    waiters[0].cancel()
+    for _, fire, key in [c.args for c in call_later.call_args_list]:
+        fire(key)
+    async with timeout(1):
+        await asyncio.gather(*waiters[1:], other_waiter)
+    assert waiters[0].cancelled()
+    assert dispatcher.scheduled_ticks == 0
+
+
+@pytest.mark.asyncio()
+async def test_tick_dispatcher_aligned():
+    loop = asyncio.get_running_loop()
+    dispatcher = async_utils.TickDispatcher()
+    for now, tick in [(100.005, 100.02), (100.021, 100.04), (100.059, 100.06)]:
+        with patch.object(time, "time", return_value=now), patch.object(loop, "call_later") as call_later:
+            waiter = asyncio.ensure_future(dispatcher.wait_til_next_tick(0.02))
+            await asyncio.sleep(0)
+        delay, fire, key = call_later.call_args.args
+        assert now + delay == pytest.approx(tick)
+        fire(key)
+        await waiter
+
+
+class FakeLoopClock:
+    """Event loop clock for ticker tests, which advances only on sleep and simulated busy time."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.now += delay
+
+
+async def take_ticks(policy, count, busy_on_first=0.0, busy=0.0, align=False):
+    """Take ticks of 1 second, with a consumer which is busy for given time after each tick."""
+    clock = FakeLoopClock()
+    ticks = []
+    with patch.object(asyncio.get_running_loop(), "time", clock.time), patch.object(asyncio, "sleep", clock.sleep):
+        generator = async_utils.ticker(1, align=align, policy=policy)
+        async for tick in generator:
+            ticks.append(tick)
+            clock.now += busy_on_first if len(ticks) == 1 else busy
+            if len(ticks) == count:
+                break
+        await generator.aclose()
+    return clock, ticks
+
+
+@pytest.mark.asyncio()
+async def test_ticker_no_drift():
+    clock, ticks = await take_ticks(async_utils.TickPolicy.SKIP, 5, busy=0.3)
+    # Time spent by the consumer doesn't shift subsequent ticks
+    assert [t.scheduled for t in ticks] == pytest.approx([1001, 1002, 1003, 1004, 1005])
+    assert clock.now == pytest.approx(1005.3)
+    assert all(t.lateness == 0 and t.missed == 0 for t in ticks)
+
+
+@pytest.mark.asyncio()
+async def test_ticker_aligned():
+    with patch.object(async_utils, "calc_delay_til_next_tick", return_value=0.25) as calc_delay:
+        clock, (tick,) = await take_ticks(async_utils.TickPolicy.SKIP, 1, align=True)
+    assert tick.scheduled == clock.now == 1000.25
+    calc_delay.assert_called_once_with(1)
+
+
+@pytest.mark.asyncio()
+async def test_ticker_skip():
+    _, (first, second) = await take_ticks(async_utils.TickPolicy.SKIP, 2, busy_on_first=2.5)
+    # Ticks at 2 and 3 seconds after the first one are skipped
+    assert second.scheduled - first.scheduled == 3
+    assert second.missed == 2
+    assert second.lateness == 0
+
+
+@pytest.mark.asyncio()
+async def test_ticker_catch_up():
+    _, ticks = await take_ticks(async_utils.TickPolicy.CATCH_UP, 4, busy_on_first=2.5)
+    assert [b.scheduled - a.scheduled for a, b in zip(ticks, ticks[1:])] == [1, 1, 1]
+    assert [t.lateness for t in ticks] == [0, 1.5, 0.5, 0]
+    assert all(t.missed == 0 for t in ticks)
+
+
+@pytest.mark.asyncio()
+async def test_ticker_coalesce():
+    _, (first, second) = await take_ticks(async_utils.TickPolicy.COALESCE, 2, busy_on_first=2.5)
+    assert second.scheduled - first.scheduled == 2
+    assert second.missed == 1
+    assert second.lateness == 0.5
+
+
 @pytest.mark.asyncio()
 async def test_safe_cancel():
     cancel_after_num_retries = 3
@@ -123,3 +662,36 @@ async def test_safe_cancel():
         retries_made = await async_utils.safe_cancel(task, info="test", cancel_wait_timeout=0.1)
 
     assert retries_made == cancel_after_num_retries
+
+
+@pytest.mark.asyncio()
+async def test_safe_cancel_is_fast():
+    task = asyncio.create_task(asyncio.sleep(300))
+    await asyncio.sleep(0)
+    async with timeout(1):
+        retries_made = await async_utils.safe_cancel(task, info="test", cancel_wait_timeout=10)
+    assert retries_made == 0
+    assert task.cancelled()
+
+
+@pytest.mark.asyncio()
+async def test_safe_cancel_many():
+    async def stubborn():
+        # Ignores the first cancel request
+        try:
+            await asyncio.sleep(300)
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(300)
+
+    tasks = [asyncio.create_task(asyncio.sleep(300)) for _ in range(100)]
+    stubborn_task = asyncio.create_task(stubborn())
+    await asyncio.sleep(0)
+
+    async with timeout(1):
+        pending = await async_utils.safe_cancel_many(tasks + [stubborn_task], info="test", cancel_wait_timeout=0.1)
+    assert pending == {stubborn_task}
+    assert all(t.cancelled() for t in tasks)
+
+    assert await async_utils.safe_cancel_many([], info="test") == set()
+    await async_utils.safe_cancel(stubborn_task, info="test", cancel_wait_timeout=0.1)
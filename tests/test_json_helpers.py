@@ -1,12 +1,31 @@
+import gzip
+import io
 import json
+import os
+import stat
 from datetime import datetime
 from decimal import Decimal
-from enum import Enum
+from enum import Enum, IntEnum, auto
+from typing import Any, Dict
+from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from birdfeeder.json_helpers import json_decode_hook, json_encode_default, to_valid_json_dict
+from birdfeeder import json_helpers
+from birdfeeder.enum.str_enum import StrEnum
+from birdfeeder.json_helpers import (
+    JSONCodec,
+    JSONTemplate,
+    dump_to_file_as_jsonl,
+    dumps_fast,
+    iter_json_array_file,
+    iter_jsonl_file,
+    json_decode_hook,
+    json_encode_default,
+    to_valid_json_dict,
+)
 
 
 class Car(Enum):
@@ -16,6 +35,16 @@ class Car(Enum):
     suv = 4
 
 
+class Side(StrEnum):
+    BUY = auto()
+    SELL = auto()
+
+
+class Priority(IntEnum):
+    LOW = 1
+    HIGH = 2
+
+
 dict_with_decimal = {"a": Decimal("10.22")}
 dict_with_car = {"a": Car.suv}
 
@@ -89,3 +118,303 @@ def test_json_encode_default_datetime():
     encoded = json.dumps(case, default=json_encode_default)
     decoded = json.loads(encoded, object_hook=json_decode_hook)
     assert decoded == case
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+@pytest.mark.parametrize("decimal_to_str", [True, False])
+@pytest.mark.parametrize("enum_to_name", [True, False])
+def test_dumps_fast(monkeypatch, use_orjson, decimal_to_str, enum_to_name):
+    if not use_orjson:
+        monkeypatch.setattr(json_helpers, "orjson", None)
+    case = {
+        "top": {"x": dict_with_decimal, "y": [dict_with_car, {Decimal("0.5"), "ß"}]},
+        "enums": [Side.BUY, {"priority": Priority.HIGH}],
+        "floats": [Decimal("0.00001"), 1e16, 1.5e-7, 0.0001, float("nan"), float("-inf")],
+        "integers": [2**64, -(2**63)],
+        "keys": {Side.BUY: 1, Priority.LOW: 2, 2.5: 3, True: 4},
+        1: None,
+    }
+    expected = json.dumps(
+        to_valid_json_dict(case, decimal_to_str=decimal_to_str, enum_to_name=enum_to_name),
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    assert dumps_fast(case, decimal_to_str=decimal_to_str, enum_to_name=enum_to_name) == expected
+
+    # Keys which the stdlib rejects
+    for key in (Car.suv, datetime(2021, 1, 1)):
+        with pytest.raises(TypeError, match="keys must be str"):
+            dumps_fast({key: 1}, decimal_to_str=decimal_to_str, enum_to_name=enum_to_name)
+
+
+def test_dumps_fast_copies_containers_with_enums():
+    levels = [{"price": Decimal("1.5")}, {"price": Decimal("2.5"), "side": Side.SELL}]
+    case = {"levels": levels, "symbol": "BTC-USDT"}
+    converted = json_helpers._enums_to_names(case)
+    assert converted == {"levels": [levels[0], {"price": Decimal("2.5"), "side": "SELL"}], "symbol": "BTC-USDT"}
+    assert converted["levels"][0] is levels[0]
+    assert levels[1] == {"price": Decimal("2.5"), "side": Side.SELL}
+    assert json_helpers._enums_to_names(levels[0]) is levels[0]
+
+
+@pytest.mark.parametrize("enum_to_name", [True, False])
+def test_dumps_fast_uses_orjson(monkeypatch, enum_to_name):
+    case = {"a": [Decimal("0.5"), Side.SELL, Priority.LOW, dict_with_car], "b": "text"}
+    expected = json.dumps(to_valid_json_dict(case, enum_to_name=enum_to_name), separators=(",", ":"))
+    monkeypatch.setattr(json_helpers, "json", MagicMock())
+    assert dumps_fast(case, enum_to_name=enum_to_name) == expected
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_fast_datetime(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(json_helpers, "orjson", None)
+    case = {"ts": pd.Timestamp("2021-01-01 10:00"), "dt": datetime(2021, 1, 1, 1, 2, 3, 4)}
+    assert dumps_fast(case, enum_to_name=False) == '{"ts":"2021-01-01T10:00:00","dt":"2021-01-01T01:02:03.000004"}'
+
+    with pytest.raises(TypeError, match="not JSON serializable"):
+        dumps_fast({"a": object()}, enum_to_name=False)
+
+
+def test_json_decode_hook_legacy_tags():
+    encoded = '{"a": {"type(Decimal)": "1.5"}, "b": [{"type(pd.Timestamp)": "2021-01-01 00:00:00"}], "c": {"d": 1}}'
+    decoded = json.loads(encoded, object_hook=json_decode_hook)
+    assert decoded == {"a": Decimal("1.5"), "b": [pd.Timestamp("2021-01-01")], "c": {"d": 1}}
+
+
+def test_json_encode_default_tag():
+    encoded = json.dumps({"a": Decimal("1.5")}, default=json_encode_default)
+    assert json.loads(encoded) == {"a": {"__type__": "Decimal", "__value__": "1.5"}}
+
+    # Not a registered type, or not a tagged value
+    plain = {"__type__": "unknown", "__value__": 1}
+    assert json.loads(json.dumps(plain), object_hook=json_decode_hook) == plain
+    with pytest.raises(TypeError, match="is not JSON serializable"):
+        json_encode_default(object())
+
+
+def test_json_codec_register():
+    class MyDecimal(Decimal):
+        pass
+
+    codec = JSONCodec()
+    codec.register(Decimal, "Decimal", str, Decimal)
+    codec.register(np.ndarray, "np.ndarray", np.ndarray.tolist, np.array)
+    codec.register(np.int64, "np.int64", int, np.int64)
+
+    case = {"a": np.arange(3), "b": np.int64(5), "c": MyDecimal("2.5")}
+    decoded = json.loads(json.dumps(case, default=codec.encode_default), object_hook=codec.decode_hook)
+    assert decoded["a"].tolist() == [0, 1, 2]
+    assert type(decoded["b"]) is np.int64
+    assert decoded["b"] == 5
+    # Subclasses are encoded as the closest registered base class
+    assert type(decoded["c"]) is Decimal
+    assert decoded["c"] == Decimal("2.5")
+
+
+records = [{"price": Decimal("1.5"), "ts": pd.Timestamp("2021-01-01")}, [1, 2.5, "x"], 12345, None]
+
+
+@pytest.mark.parametrize("file_name", ["records.jsonl", "records.jsonl.gz"])
+def test_jsonl_file(tmp_path, file_name):
+    path = str(tmp_path / file_name)
+    assert dump_to_file_as_jsonl(iter(records), path) == 4
+    assert list(iter_jsonl_file(path)) == records
+    assert list(tmp_path.iterdir()) == [tmp_path / file_name]
+
+
+def test_jsonl_file_atomic(tmp_path):
+    path = str(tmp_path / "records.jsonl")
+    dump_to_file_as_jsonl(records, path)
+
+    def failing_records():
+        yield records[0]
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        dump_to_file_as_jsonl(failing_records(), path)
+    assert list(iter_jsonl_file(path)) == records
+    assert list(tmp_path.iterdir()) == [tmp_path / "records.jsonl"]
+
+    with pytest.raises(ValueError, match="Unknown compression"):
+        dump_to_file_as_jsonl(records, path, compression="bz2")
+
+
+def test_jsonl_file_permissions(tmp_path):
+    path = tmp_path / "records.jsonl"
+    umask = os.umask(0o027)
+    try:
+        with patch("os.fsync", wraps=os.fsync) as fsync, patch("os.umask") as umask_mock:
+            dump_to_file_as_jsonl(records, str(path))
+    finally:
+        os.umask(umask)
+    fsync.assert_called_once()
+    # The process-wide umask is not changed
+    umask_mock.assert_not_called()
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+
+def test_jsonl_file_zstd(tmp_path):
+    pytest.importorskip("zstandard")
+    path = str(tmp_path / "records.jsonl.zst")
+    dump_to_file_as_jsonl(records, path)
+    assert list(iter_jsonl_file(path)) == records
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_iter_json_array_file(tmp_path, chunk_size):
+    path = tmp_path / "array.json.gz"
+    with gzip.open(path, "wt") as fd:
+        json.dump(records, fd, indent=4, default=json_encode_default)
+    assert list(iter_json_array_file(str(path), chunk_size=chunk_size)) == records
+
+    path = tmp_path / "empty.json"
+    path.write_text(" [\n ] ")
+    assert list(iter_json_array_file(str(path), chunk_size=chunk_size)) == []
+
+
+@pytest.mark.parametrize(
+    ("content", "match"),
+    [
+        ('{"a": 1}', "doesn't contain a JSON array"),
+        ("[1, 2", "Expected ',' or ']'"),
+        ("[1 2]", "Expected ',' or ']'"),
+        ('[1, {"a": ]', "Expecting value"),
+    ],
+)
+def test_iter_json_array_file_malformed(tmp_path, content, match):
+    path = tmp_path / "array.json"
+    path.write_text(content)
+    with pytest.raises(ValueError, match=match):
+        list(iter_json_array_file(str(path), chunk_size=2))
+
+
+def test_iter_json_array_file_error_position():
+    content = '[\n  {"a": 1},\n  {"b": tru},\n' + "  1,\n" * 10_000 + "  1\n]"
+    reader = io.StringIO(content)
+    with patch.object(json_helpers, "_open_text", return_value=reader):
+        with patch.object(reader, "read", wraps=reader.read) as read:
+            with pytest.raises(json.JSONDecodeError, match=r"Expecting value: line 3 column 9 \(char 22\)") as error:
+                list(iter_json_array_file("array.json", chunk_size=4))
+    # The error is raised without reading the rest of the file
+    assert read.call_count < 10
+    assert error.value.pos == content.index("tru")
+
+
+trade_template = JSONTemplate(
+    {
+        ("p", str, Decimal, "price"),
+        ("q", str, float, "amount"),
+        ("T", int, int, "timestamp"),
+        ("m", bool, bool, "maker"),
+    }
+)
+
+
+def test_json_template_decode_encode():
+    message = {"p": "42000.1", "q": "0.5", "T": 1600000000000, "m": True, "ignored": 1}
+    record = trade_template.decode(message)
+    assert record == {"amount": 0.5, "maker": True, "price": Decimal("42000.1"), "timestamp": 1600000000000}
+    assert list(record) == ["amount", "maker", "price", "timestamp"]
+    assert trade_template.decode({}) == {"amount": 0.0, "maker": False, "price": Decimal("0"), "timestamp": 0}
+
+    assert trade_template.encode(record) == {"q": "0.5", "m": True, "p": "42000.1", "T": 1600000000000}
+    assert trade_template.encode({"price": Decimal("1.5")}) == {"q": "0.0", "m": False, "p": "1.5", "T": 0}
+
+
+def test_json_template_compile_lookup():
+    namespace: Dict[str, Any] = {}
+    lookup = json_helpers._compile_lookup(namespace, 0, "message", "S", Side)
+    assert lookup == "(message['S'] if 'S' in message else _default_factory_0())"
+    get = json_helpers._compile_function("get", f"def get(message):\n    return {lookup}\n", namespace)
+    assert get({"S": "buy"}) == "buy"
+    # A default which can't be created fails only for a missing key
+    with pytest.raises(TypeError):
+        get({})
+
+    assert json_helpers._compile_lookup(namespace, 1, "message", "p", str) == "message.get('p', _default_1)"
+    assert namespace["_default_1"] == ""
+
+
+def test_json_template_decode_columns():
+    messages = [{"p": "1.5", "q": "0.5", "T": 1, "m": True}, {"p": "2.5", "q": "1e-3", "T": 2}]
+    columns = trade_template.decode_columns(messages)
+    assert columns["amount"].dtype == np.float64
+    assert columns["amount"].tolist() == [0.5, 0.001]
+    assert columns["timestamp"].dtype == np.int64
+    assert columns["price"].tolist() == [Decimal("1.5"), Decimal("2.5")]
+    assert columns["maker"].tolist() == [True, False]
+
+    frame = trade_template.decode_frame(messages)
+    assert list(frame.columns) == ["amount", "maker", "price", "timestamp"]
+    assert frame["timestamp"].tolist() == [1, 2]
+    assert trade_template.decode_frame([]).empty
+
+
+def test_json_template_decode_columns_fallback():
+    template = JSONTemplate({("v", int, int, "volume")})
+    volume = template.decode_columns([{"v": 7}, {"v": 2**70}])["volume"]
+    assert volume.dtype == object
+    assert volume.tolist() == [7, 2**70]
+
+
+def test_json_template_default_dict():
+    default_dict = trade_template.default_dict
+    assert default_dict == {"p": "0", "q": "0.0", "T": 0, "m": False}
+    default_dict["p"] = "1"
+    assert trade_template.default_dict["p"] == "0"
+
+    default_mapping = trade_template.default_mapping
+    assert default_mapping == {"p": "0", "q": "0.0", "T": 0, "m": False}
+    with pytest.raises(TypeError):
+        default_mapping["p"] = "1"  # type: ignore
+
+
+def test_json_template_mutable_defaults():
+    template = JSONTemplate({("b", list, list, "bids"), ("s", str, str, "symbol")})
+    default_dict = template.default_dict
+    default_dict["b"].append(1)
+    assert template.default_dict == {"b": [], "s": ""}
+
+    record = template.record_type()
+    record.bids.append(1)
+    assert template.record_type().bids == []
+    assert template.record_type(bids=[2]).bids == [2]
+
+
+def test_json_template_enum_field():
+    # An Enum has no constructor without arguments, so there is no default side
+    template = JSONTemplate({("S", str, Side, "side"), ("p", str, Decimal, "price")})
+    assert template.name_key_map == {"side": "S", "price": "p"}
+    assert template.decode({"S": "buy"}) == {"price": Decimal("0"), "side": Side.BUY}
+    assert template.encode({"side": Side.SELL}) == {"S": str(Side.SELL), "p": "0"}
+    assert template.decode_columns([{"S": "buy", "p": "1.5"}])["side"].tolist() == [Side.BUY]
+    record = template.decode_record({"S": "sell", "p": "1.5"})
+    assert record == template.record_type(side=Side.SELL, price=Decimal("1.5"))
+
+    with pytest.raises(TypeError):
+        template.decode({"p": "1.5"})
+    with pytest.raises(TypeError):
+        template.decode_columns([{"p": "1.5"}])
+    with pytest.raises(TypeError):
+        template.record_type(price=Decimal("1.5"))
+    with pytest.raises(TypeError):
+        template.default_dict
+
+
+def test_json_template_record_type():
+    record_type = trade_template.record_type
+    assert trade_template.record_type is record_type
+
+    record = trade_template.decode_record({"p": "42000.1", "q": "0.5", "T": 1})
+    assert record == record_type(amount=0.5, price=Decimal("42000.1"), timestamp=1)
+    assert record._asdict() == {"amount": 0.5, "maker": False, "price": Decimal("42000.1"), "timestamp": 1}
+    assert repr(record) == "JSONTemplateRecord(amount=0.5, maker=False, price=Decimal('42000.1'), timestamp=1)"
+    record.maker = True
+    assert record.maker is True
+    with pytest.raises(AttributeError):
+        record.unknown = 1
+    assert not hasattr(record, "__dict__")
+
+    with pytest.raises(ValueError, match="should be identifiers"):
+        JSONTemplate({("k", str, str, "not valid")}).record_type
@@ -1,6 +1,32 @@
+import math
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Process
 from unittest.mock import MagicMock, patch
 
-from birdfeeder.timed_aggregator import TimedAggregator, TimedMetricItem, average, summation
+import numpy as np
+import pandas as pd
+import pytest
+
+from birdfeeder.timed_aggregator import (
+    BucketedTimedAggregator,
+    ColumnarTimedAggregator,
+    DDSketch,
+    DecayingAggregator,
+    MultiWindowAggregator,
+    SharedBucketedTimedAggregator,
+    ThreadSafeTimedAggregator,
+    TimedAggregator,
+    TimedAggregatorRegistry,
+    TimedMetricItem,
+    average,
+    maximum,
+    minimum,
+    quantile,
+    summation,
+    variance,
+)
 
 
 def test_create_with_value():
@@ -48,3 +74,537 @@ def test_timed_aggregator_average():
     aggregator.add(value=2)
 
     assert aggregator.average_value == 5
+
+
+def test_variance():
+    values = [2, 4, 4, 4, 5, 5, 7, 9]
+    assert variance(TimedMetricItem.create_with_value(i) for i in values) == 4
+
+
+def test_timed_aggregator_running_aggregates():
+    time = MagicMock(return_value=0)
+    aggregator = TimedAggregator(10, aggregation_func=summation, time_func=time)
+
+    for i, value in enumerate([2.5, 4, 4, 4, 5, 5, 7, 9]):
+        time.return_value = i
+        aggregator.add(value)
+
+    # The first item is out of the window
+    time.return_value = 10.5
+    assert aggregator.aggregated_value == 38
+    assert aggregator.count == 7
+    assert aggregator.average_value == pytest.approx(38 / 7)
+    assert aggregator.variance_value == pytest.approx(variance(aggregator._window))
+
+    time.return_value = 100
+    assert aggregator.aggregated_value == 0
+    assert aggregator.count == 0
+    with pytest.raises(ZeroDivisionError):
+        aggregator.average_value
+
+
+def test_timed_aggregator_custom_func():
+    time = MagicMock(return_value=0)
+    aggregator = TimedAggregator(10, aggregation_func=lambda items: max(i.value for i in items), time_func=time)
+    for value in [3, 7, 5]:
+        aggregator.add(value)
+    assert aggregator.aggregated_value == 7
+
+
+def test_timed_aggregator_fast_path_matches_scan():
+    time = MagicMock(return_value=0)
+    for func in [summation, average, variance]:
+        aggregator = TimedAggregator(10, aggregation_func=func, time_func=time)
+        for i in range(20):
+            time.return_value = i * 0.7
+            aggregator.add(i * 1.1)
+        assert aggregator.aggregated_value == pytest.approx(func(aggregator._window))
+
+
+def test_timed_aggregator_variance_of_large_values():
+    time = MagicMock(return_value=0)
+    values = [42000.1 + (i % 3) * 0.01 for i in range(1000)]
+    expected = variance(TimedMetricItem(0, value) for value in values)
+    one_by_one = TimedAggregator(10, aggregation_func=variance, time_func=time)
+    for value in values:
+        one_by_one.add(value)
+    batch = TimedAggregator(10, aggregation_func=variance, time_func=time)
+    batch.add_many(values)
+    for aggregator in [one_by_one, batch]:
+        assert aggregator.variance_value == pytest.approx(expected, rel=1e-6)
+        assert aggregator.aggregated_value == pytest.approx(expected, rel=1e-6)
+
+    # The window is emptied and refilled around a different value
+    time.return_value = 20
+    one_by_one.add_many([0.5, 1.5])
+    assert one_by_one.variance_value == 0.25
+
+
+def test_timed_aggregator_min_max():
+    time = MagicMock(return_value=0)
+    tracked = TimedAggregator(5, aggregation_func=maximum, time_func=time)
+    scanned = TimedAggregator(5, aggregation_func=summation, time_func=time)
+    values = [5, 1, 4, 8, 2, 7, 3, 3, 9, 0, 6, 6, 1]
+    for i, value in enumerate(values):
+        time.return_value = i
+        tracked.add(value)
+        scanned.add(value)
+        expected = [v for j, v in enumerate(values) if i - 5 <= j <= i]
+        assert tracked.aggregated_value == tracked.max_value == scanned.max_value == max(expected)
+        assert tracked.min_value == scanned.min_value == min(expected)
+
+    time.return_value = 100
+    with pytest.raises(ValueError, match="empty window"):
+        tracked.min_value
+
+
+def test_timed_aggregator_min_aggregation_func():
+    time = MagicMock(return_value=0)
+    aggregator = TimedAggregator(5, aggregation_func=minimum, time_func=time)
+    for value in [3, 1, 2]:
+        aggregator.add(value)
+    assert aggregator.aggregated_value == 1
+
+
+def test_quantile():
+    items = [TimedMetricItem(0, v) for v in range(101)]
+    assert quantile(items, 0.5) == 50
+    assert quantile(items, 0.99) == 99
+    assert quantile(items, 1) == 100
+
+
+def test_dd_sketch():
+    sketch = DDSketch(relative_accuracy=0.01)
+    values = [-5.0, 0.0] + [1.1**i for i in range(200)]
+    for value in values:
+        sketch.add(value)
+    for value in values[:50]:
+        sketch.remove(value)
+
+    remaining = sorted(values[50:])
+    for fraction in [0, 0.5, 0.9, 0.99, 1]:
+        exact = remaining[int(fraction * (len(remaining) - 1))]
+        assert sketch.quantile(fraction) == pytest.approx(exact, rel=0.01)
+    assert sketch.count == len(remaining)
+    assert sketch.num_buckets == len(remaining)
+
+
+def test_dd_sketch_negative_and_zero():
+    sketch = DDSketch()
+    for value in [-100, -10, 0, 0, 10]:
+        sketch.add(value)
+    assert sketch.quantile(0) == pytest.approx(-100, rel=0.01)
+    assert sketch.quantile(0.5) == 0
+    assert sketch.quantile(1) == pytest.approx(10, rel=0.01)
+
+    with pytest.raises(ValueError, match="relative_accuracy"):
+        DDSketch(0)
+
+
+def test_timed_aggregator_quantile():
+    time = MagicMock(return_value=0)
+    exact = TimedAggregator(10, time_func=time)
+    approximate = TimedAggregator(10, time_func=time, quantile_accuracy=0.01)
+    for i in range(1000):
+        time.return_value = i / 50
+        exact.add(i)
+        approximate.add(i)
+    assert exact.count == 501
+    assert exact.quantile(0.99) == 994
+    assert approximate.quantile(0.99) == pytest.approx(994, rel=0.01)
+
+
+def test_bucketed_timed_aggregator():
+    time = MagicMock(return_value=0)
+    aggregator = BucketedTimedAggregator(10, time_func=time, num_buckets=10)
+
+    for i in range(20):
+        time.return_value = i + 0.5
+        aggregator.add(i)
+    # Buckets 10..19 are in the window
+    assert aggregator.aggregated_value == sum(range(10, 20))
+    assert aggregator.count == 10
+    assert aggregator.average_value == 14.5
+
+    time.return_value = 25.5
+    assert aggregator.aggregated_value == sum(range(16, 20))
+
+    time.return_value = 100
+    assert aggregator.aggregated_value == 0
+    assert aggregator.count == 0
+
+
+def test_bucketed_timed_aggregator_same_as_timed_aggregator():
+    time = MagicMock(return_value=0)
+    bucketed = BucketedTimedAggregator(60, aggregation_func=average, time_func=time)
+    plain = TimedAggregator(59, aggregation_func=average, time_func=time)
+    for i in range(1000):
+        time.return_value = i / 10
+        bucketed.add(i % 7)
+        plain.add(i % 7)
+    # On a bucket boundary, bucketed window consists of 59 full buckets and an empty current one
+    time.return_value = 100
+    assert bucketed.aggregated_value == pytest.approx(plain.aggregated_value)
+
+
+def test_bucketed_timed_aggregator_unsupported_func():
+    with pytest.raises(ValueError, match="Only summation and average are supported"):
+        BucketedTimedAggregator(60, aggregation_func=maximum)
+
+
+def test_timed_aggregator_add_many():
+    time = MagicMock(return_value=0)
+    aggregator = TimedAggregator(10, time_func=time, track_extremes=True)
+    aggregator.add(100)
+
+    time.return_value = 11
+    aggregator.add_many(np.array([1, 2, 3]))
+    time.assert_called_with()
+    assert time.call_count == 2
+    assert aggregator.aggregated_value == 6
+    assert aggregator.max_value == 3
+    assert all(isinstance(item.value, int) for item in aggregator._window)
+
+    aggregator.add_many([4.5, 5.5], timestamps=[12, 13])
+    assert [item.timestamp for item in aggregator._window] == [11, 11, 11, 12, 13]
+    assert aggregator.variance_value == pytest.approx(variance(aggregator._window))
+
+    time.return_value = 21.5
+    assert aggregator.aggregated_value == 10
+    assert aggregator.min_value == 4.5
+
+
+@pytest.mark.parametrize(
+    "create_aggregator",
+    [
+        lambda time: TimedAggregator(10, time_func=time),
+        lambda time: TimedAggregator(10, time_func=time, track_extremes=True),
+        lambda time: BucketedTimedAggregator(10, time_func=time),
+        lambda time: ColumnarTimedAggregator(10, time_func=time),
+        lambda time: DecayingAggregator(10, time_func=time),
+    ],
+)
+def test_add_many_length_mismatch(create_aggregator):
+    aggregator = create_aggregator(MagicMock(return_value=0))
+    with pytest.raises(ValueError, match="Got 3 values, but 1 timestamps"):
+        aggregator.add_many([1, 2, 3], timestamps=[0])
+    assert aggregator.count == 0
+
+
+def test_bucketed_timed_aggregator_add_many():
+    time = MagicMock(return_value=0.5)
+    aggregator = BucketedTimedAggregator(10, time_func=time, num_buckets=10)
+    aggregator.add_many(np.array([1.0, 2.0, 3.0]))
+    aggregator.add_many([], timestamps=[])
+    aggregator.add_many([4, 5], timestamps=[3.5, 9.5])
+
+    time.return_value = 9.5
+    assert aggregator.aggregated_value == 15
+    assert aggregator.count == 5
+
+    time.return_value = 10.5
+    assert aggregator.aggregated_value == 9
+
+
+def test_columnar_timed_aggregator_same_as_timed_aggregator():
+    time = MagicMock(return_value=0)
+    columnar = ColumnarTimedAggregator(10, time_func=time, initial_capacity=4)
+    plain = TimedAggregator(10, time_func=time, track_extremes=True)
+    for i in range(100):
+        time.return_value = i / 3
+        columnar.add(i % 11)
+        plain.add(i % 11)
+
+    assert columnar.count == plain.count == 31
+    assert columnar.aggregated_value == plain.aggregated_value
+    assert columnar.average_value == pytest.approx(plain.average_value)
+    assert columnar.variance_value == pytest.approx(plain.variance_value)
+    assert columnar.std_value == pytest.approx(plain.variance_value**0.5)
+    assert columnar.min_value == plain.min_value
+    assert columnar.max_value == plain.max_value
+    assert columnar.quantile(0.9) == plain.quantile(0.9)
+    assert len(columnar._buffer) == 64
+
+
+def test_columnar_timed_aggregator_aggregation_funcs():
+    time = MagicMock(return_value=0)
+    for func in [average, variance, minimum, maximum, lambda items: sum(i.value for i in items)]:
+        aggregator = ColumnarTimedAggregator(10, aggregation_func=func, time_func=time)
+        aggregator.add_many([3, 1, 2])
+        assert aggregator.aggregated_value == pytest.approx(func(TimedMetricItem(0, v) for v in [3, 1, 2]))
+
+    time.return_value = 20
+    with pytest.raises(ZeroDivisionError):
+        aggregator.average_value
+    with pytest.raises(ValueError, match="empty window"):
+        aggregator.quantile(0.5)
+
+
+def test_columnar_timed_aggregator_add_many():
+    time = MagicMock(return_value=10)
+    aggregator = ColumnarTimedAggregator(10, time_func=time, initial_capacity=2)
+    aggregator.add_many(np.arange(5))
+    aggregator.add_many([5, 6], timestamps=[12, 13])
+    assert aggregator.timestamps.tolist() == [10] * 5 + [12, 13]
+
+    time.return_value = 21
+    assert aggregator.values.tolist() == [5, 6]
+
+
+def test_timed_aggregator_imports_pandas_lazily():
+    code = "import sys, birdfeeder.timed_aggregator; assert 'pandas' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_columnar_timed_aggregator_add_many_generators():
+    aggregator = ColumnarTimedAggregator(10, time_func=MagicMock(return_value=5))
+    aggregator.add_many(value for value in range(3))
+    aggregator.add_many((value for value in [3, 4]), timestamps=(timestamp for timestamp in [5, 5]))
+    assert aggregator.aggregated_value == 10
+    assert aggregator.count == 5
+
+
+def test_columnar_timed_aggregator_initial_capacity():
+    with pytest.raises(ValueError, match="initial_capacity should be positive"):
+        ColumnarTimedAggregator(10, initial_capacity=0)
+    aggregator = ColumnarTimedAggregator(10, time_func=MagicMock(return_value=0), initial_capacity=1)
+    aggregator.add_many(range(5))
+    aggregator.add(5)
+    assert aggregator.aggregated_value == 15
+
+
+def test_columnar_timed_aggregator_to_frame():
+    time = MagicMock(return_value=0)
+    aggregator = ColumnarTimedAggregator(10, time_func=time)
+    aggregator.add_many([1, 2, 3], timestamps=[0, 1, 2])
+    time.return_value = 11
+
+    frame = aggregator.to_frame()
+    assert frame.to_dict("list") == {"timestamp": [1, 2], "value": [2, 3]}
+    assert np.shares_memory(frame.to_numpy(), aggregator._buffer)
+
+
+def test_thread_safe_timed_aggregator():
+    aggregator = ThreadSafeTimedAggregator(60, track_extremes=True)
+
+    def produce():
+        for i in range(1000):
+            aggregator.add(i)
+            aggregator.max_value
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for future in [executor.submit(produce) for _ in range(8)]:
+            future.result()
+
+    assert aggregator.count == 8000
+    assert aggregator.aggregated_value == 8 * sum(range(1000))
+    assert aggregator.min_value == 0
+    assert aggregator.max_value == 999
+
+
+def add_in_process(name: str, writer_index: int, now: float) -> None:
+    aggregator = SharedBucketedTimedAggregator(
+        10, time_func=lambda: now, num_buckets=10, num_writers=3, writer_index=writer_index, name=name
+    )
+    for _ in range(100):
+        aggregator.add(writer_index + 1)
+    aggregator.close()
+
+
+def test_shared_bucketed_timed_aggregator():
+    time = MagicMock(return_value=100)
+    aggregator = SharedBucketedTimedAggregator(
+        10, aggregation_func=average, time_func=time, num_buckets=10, num_writers=3
+    )
+    try:
+        aggregator.add(7)
+        processes = [Process(target=add_in_process, args=(aggregator.name, i, 99.5 + i)) for i in range(1, 3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        time.return_value = 102
+        assert aggregator.count == 201
+        assert aggregator.aggregated_value == pytest.approx((7 + 200 + 300) / 201)
+
+        time.return_value = 110.5
+        assert aggregator.count == 100
+        assert aggregator.average_value == 3
+    finally:
+        aggregator.close()
+        aggregator.unlink()
+
+
+def test_shared_bucketed_timed_aggregator_writer_index():
+    with pytest.raises(ValueError, match="writer_index"):
+        SharedBucketedTimedAggregator(10, num_writers=2, writer_index=2)
+
+
+def test_timed_aggregator_registry():
+    time = MagicMock(return_value=0)
+    registry = TimedAggregatorRegistry(10, time_func=time, label_names=("exchange", "symbol"))
+    registry.add(("binance", "BTC-USDT"), 2)
+    registry.add(("binance", "ETH-USDT"))
+    time.return_value = 5
+    registry.add(("binance", "BTC-USDT"), 3)
+
+    assert registry.aggregated_value(("binance", "BTC-USDT")) == 5
+    time.return_value = 12
+    assert registry.aggregated_value(("binance", "ETH-USDT")) == 0
+    assert registry.snapshot() == {("binance", "BTC-USDT"): 3}
+    assert ("binance", "ETH-USDT") not in registry
+    assert registry.aggregated_value(("binance", "ETH-USDT")) == 0
+
+    frame = registry.snapshot(as_frame=True)
+    assert isinstance(frame, pd.DataFrame)
+    assert frame.index.names == ["exchange", "symbol"]
+    assert frame.loc[("binance", "BTC-USDT"), "value"] == 3
+
+    time.return_value = 20
+    frame = registry.snapshot(as_frame=True)
+    assert isinstance(frame, pd.DataFrame)
+    assert frame.empty
+    assert len(registry) == 0
+    # A dropped series has the value of an empty window, same as before obsolete values were removed
+    assert registry.aggregated_value(("binance", "BTC-USDT")) == 0
+    assert registry.aggregated_value(("binance", "unknown")) == 0
+
+
+def test_timed_aggregator_registry_max_series():
+    time = MagicMock(return_value=0)
+    registry = TimedAggregatorRegistry(10, aggregation_func=average, time_func=time, max_series=2)
+    registry.add("a", 1)
+    registry.add("b", 2)
+    registry.add("a", 3)
+    registry.add("c", 4)
+
+    assert registry.snapshot() == {"a": 2, "c": 4}
+    frame = registry.snapshot(as_frame=True)
+    assert isinstance(frame, pd.DataFrame)
+    assert frame["value"].to_dict() == {"a": 2, "c": 4}
+    with pytest.raises(ZeroDivisionError):
+        registry.aggregated_value("b")
+
+
+def test_decaying_aggregator():
+    time = MagicMock(return_value=0)
+    aggregator = DecayingAggregator(10, time_func=time)
+    assert aggregator.aggregated_value == 0
+
+    aggregator.add(5)
+    time.return_value = 10
+    assert aggregator.aggregated_value == pytest.approx(5 / math.e)
+    assert aggregator.count == pytest.approx(1 / math.e)
+    assert aggregator.rate == pytest.approx(0.5 / math.e)
+
+    # A steady stream of 1 event per second converges to the number of events in a window
+    for second in range(11, 1000):
+        time.return_value = second
+        aggregator.add()
+    assert aggregator.aggregated_value == pytest.approx(10, rel=0.1)
+    assert aggregator.rate == pytest.approx(1, rel=0.1)
+
+
+def test_decaying_aggregator_average():
+    time = MagicMock(return_value=0)
+    aggregator = DecayingAggregator(10, aggregation_func=average, time_func=time)
+    with pytest.raises(ZeroDivisionError):
+        aggregator.aggregated_value
+
+    aggregator.add_many([2, 4])
+    time.return_value = 10
+    aggregator.add_many([10, 6], timestamps=[10, 0])
+    assert aggregator.count == pytest.approx(1 + 3 / math.e)
+    assert aggregator.average_value == pytest.approx((10 + 12 / math.e) / (1 + 3 / math.e))
+    assert aggregator.aggregated_value == aggregator.average_value
+
+    with pytest.raises(ValueError, match="Only summation and average"):
+        DecayingAggregator(10, aggregation_func=maximum)
+
+
+def test_multi_window_aggregator():
+    time = MagicMock(return_value=0)
+    aggregator = MultiWindowAggregator([60, 1, 10], time_func=time, num_buckets=10)
+    assert aggregator.window_sizes == (1, 10, 60)
+    for second in range(100):
+        time.return_value = second + 0.5
+        aggregator.add(1)
+    aggregator.add_many([2, 3])
+    aggregator.add_many([4], timestamps=[98.5])
+
+    assert aggregator.aggregated_value(window=1) == 6
+    assert aggregator.count(window=10) == 13
+    assert aggregator.aggregated_value() == 58 + 5 + 4
+    assert aggregator.snapshot() == {1: 6, 10: 19, 60: 67}
+
+    with pytest.raises(ValueError, match="Unknown window 5"):
+        aggregator.aggregated_value(window=5)
+    with pytest.raises(ValueError, match="Got 1 values, but 2 timestamps"):
+        aggregator.add_many([1], timestamps=[99, 99])
+    assert aggregator.snapshot() == {1: 6, 10: 19, 60: 67}
+
+
+def test_multi_window_aggregator_rollups():
+    time = MagicMock(return_value=0)
+    aggregator = MultiWindowAggregator([1, 10, 60], time_func=time, num_buckets=10)
+    separate = {window: BucketedTimedAggregator(window, time_func=time, num_buckets=10) for window in (1, 10, 60)}
+    with patch.object(
+        BucketedTimedAggregator, "_add_at", autospec=True, side_effect=BucketedTimedAggregator._add_at
+    ) as add_at:
+        for tick in range(1000):
+            time.return_value = tick * 0.05 + 0.025
+            aggregator.add(tick)
+        # Larger windows get a sum per bucket of the smallest window, not every value
+        assert add_at.call_count == 2 * 499
+
+    aggregator.add_many([5, 7], timestamps=[45.05, 20])
+    for expected in separate.values():
+        for tick in range(1000):
+            time.return_value = tick * 0.05 + 0.025
+            expected.add(tick)
+        expected.add_many([5, 7], timestamps=[45.05, 20])
+    for now in (49.95, 50.5, 55, 75, 120):
+        time.return_value = now
+        assert aggregator.snapshot() == {window: expected.aggregated_value for window, expected in separate.items()}
+
+
+def test_multi_window_aggregator_average():
+    time = MagicMock(return_value=0)
+    aggregator = MultiWindowAggregator([1, 10], aggregation_func=average, time_func=time)
+    aggregator.add(2)
+    time.return_value = 5
+    aggregator.add(4)
+
+    assert aggregator.snapshot() == {1: 4, 10: 3}
+    assert aggregator.average_value(window=10) == 3
+
+
+def test_timed_aggregator_monotonic():
+    with patch("time.monotonic_ns", return_value=10**12) as monotonic_ns:
+        aggregator = TimedAggregator.monotonic(1.5, aggregation_func=average)
+        aggregator.add(1)
+        monotonic_ns.return_value = 10**12 + 1_500_000_000
+        aggregator.add(3)
+        assert aggregator.aggregated_value == 2
+
+        monotonic_ns.return_value += 1
+        assert aggregator.aggregated_value == 3
+        assert aggregator.count == 1
+
+
+def test_timed_aggregator_eviction_threshold():
+    time = MagicMock(return_value=0)
+    aggregator = TimedAggregator(10, time_func=time, eviction_threshold=3)
+    for second in range(0, 40, 10):
+        time.return_value = second
+        aggregator.add(1)
+    # Obsolete values are kept until the window exceeds the threshold
+    assert len(aggregator._window) == 4
+
+    aggregator.add(1)
+    assert len(aggregator._window) == 3
+    assert aggregator.count == 3
+    time.return_value = 45
+    assert aggregator.aggregated_value == 0
+    assert len(aggregator._window) == 0